@@ -1,57 +1,127 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, Body, Header, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+import csv
+import io
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from bson import ObjectId
-from ..models.user import User, UserProfileResponse, LoginResponse, ClearUsersRequest
-from ..models.expense import Expense, ExpenseCreate
-from ..core.database import db
-from ..utils.auth import create_access_token, get_current_user, get_current_active_user
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from ..models.user import (
+    BaseCurrencyUpdate, User, UserProfileResponse, LoginResponse, ClearUsersRequest, RefreshTokenRequest,
+    TokenRefreshResponse
+)
+from ..models.job import JobStatus
+from ..models.expense import (
+    BulkImportError, BulkImportResult, DescriptionSuggestion, Expense, ExpenseCategory, ExpenseCreate,
+    ExpenseSearchResult, ExpenseSummary, ExpenseChanges, ExpenseSummaryRow, ExportFormat, SortOrder, SummaryGroupBy
+)
+from ..core.database import causal_point, db, read_db, read_session
+from ..core.metrics import pool_listener
+from ..utils.auth import (
+    auth_cache_stats, cache_principal, create_access_token, get_current_active_user, get_current_user,
+    require_admin, revoke_all_tokens, revoke_user_tokens, token_claims
+)
 from ..core.config import settings
-from passlib.hash import bcrypt
+from ..services import analytics, data_versions, events, export, fx, jobs, rollups, suggestions, summary, sync
+from ..services.fx import fx_rates
+from ..services.insights_cache import insights_cache
+from ..services.jobs import job_runner
+from ..services.expense_filters import build_expense_filter
+from ..utils.admission import admission_stats, admit_by_ip, admit_by_user
+from ..utils.passwords import password_hasher
+from ..utils import refresh_tokens
+from ..utils.http_cache import etag_headers, is_not_modified, make_etag, not_modified_response, set_etag
+from ..utils.serialization import EXPENSE_PROJECTION, FastJSONResponse, expense_to_dict
+from ..utils.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-def get_password_hash(password: str):
-    return bcrypt.hash(password)
+VALID_CATEGORIES = [category.value for category in ExpenseCategory]
 
-def verify_password(plain_password: str, hashed_password: str):
-    return bcrypt.verify(plain_password, hashed_password)
+def validate_expense_fields(amount, category, date, currency=None):
+    # Shared by single and bulk writes; raises HTTPException(400) on the first bad field
+    # Validate amount
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Amount must be a number")
+    if amount <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Amount must be greater than 0"
+        )
+
+    # Validate category
+    category = str(getattr(category, "value", category) or "other").lower()
+    if category not in VALID_CATEGORIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid category. Must be one of: {', '.join(VALID_CATEGORIES)}"
+        )
+
+    # Validate date
+    try:
+        expense_date = date if isinstance(date, datetime) else datetime.fromisoformat(str(date).replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date format"
+        )
+    if expense_date.tzinfo is not None:
+        expense_date = expense_date.astimezone(timezone.utc).replace(tzinfo=None)
+    if expense_date > datetime.utcnow() + timedelta(days=1):
+        raise HTTPException(
+            status_code=400,
+            detail="Expense date cannot be in the future"
+        )
+
+    # Validate currency
+    try:
+        currency = fx.validate_currency(currency or settings.DEFAULT_CURRENCY)
+    except fx.UnsupportedCurrency as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return amount, category, expense_date, currency
 
 # User endpoints
-@router.post("/users", response_model=UserProfileResponse)
-@router.post("/users/", response_model=UserProfileResponse)
+@router.post("/users", response_model=UserProfileResponse, dependencies=[Depends(admit_by_ip("users"))])
+@router.post("/users/", response_model=UserProfileResponse, dependencies=[Depends(admit_by_ip("users"))])
 async def create_user(user: User):
     try:
-        # Check if username already exists
-        existing_username = await db.users.find_one({"username": user.username})
-        if existing_username:
-            raise HTTPException(status_code=400, detail="Username already exists")
-        
-        # Check if email already exists
-        existing_email = await db.users.find_one({"email": user.email})
-        if existing_email:
-            raise HTTPException(status_code=400, detail="Email already exists")
-        
+        try:
+            base_currency = fx.validate_currency(user.base_currency or settings.DEFAULT_CURRENCY)
+        except fx.UnsupportedCurrency as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # Hash the password
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         
         # Prepare user data for insertion
         user_data = {
             "username": user.username,
             "email": user.email,
-            "password": hashed_password
+            "password": hashed_password,
+            "base_currency": base_currency
         }
         
-        # Insert user into database
-        result = await db.users.insert_one(user_data)
+        # Insert user into database; the unique indexes reject taken usernames and emails
+        try:
+            result = await db.users.insert_one(user_data)
+        except DuplicateKeyError as e:
+            key_pattern = (e.details or {}).get("keyPattern", {})
+            if "email" in key_pattern:
+                raise HTTPException(status_code=400, detail="Email already exists")
+            raise HTTPException(status_code=400, detail="Username already exists")
         user_data["_id"] = result.inserted_id
         
         # Return user profile response
         return UserProfileResponse(
             username=user.username,
-            email=user.email
+            email=user.email,
+            base_currency=base_currency
         )
     except HTTPException:
         raise
@@ -59,8 +129,8 @@ async def create_user(user: User):
         logger.error(f"Error creating user: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error creating user")
 
-@router.post("/token", response_model=LoginResponse)
-@router.post("/token/", response_model=LoginResponse)
+@router.post("/token", response_model=LoginResponse, dependencies=[Depends(admit_by_ip("token"))])
+@router.post("/token/", response_model=LoginResponse, dependencies=[Depends(admit_by_ip("token"))])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     try:
         # Find user by username
@@ -75,23 +145,24 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         stored_password = user.get('password')
         
         # Verify password
-        if not verify_password(form_data.password, stored_password):
+        if not await password_hasher.verify(form_data.password, stored_password):
             raise HTTPException(
                 status_code=401, 
                 detail="Incorrect username or password"
             )
         
-        # Create access token
-        access_token = create_access_token(
-            data={"sub": user['username']}
-        )
+        # Create access token and warm the principal cache for the requests that follow
+        access_token = create_access_token(data=token_claims(user))
+        cache_principal(user)
+        refresh_token = await refresh_tokens.issue_refresh_token(user)
         
         return LoginResponse(
             access_token=access_token,
             token_type="bearer",
             user_id=str(user['_id']),
             username=user['username'],
-            email=user['email']
+            email=user['email'],
+            refresh_token=refresh_token
         )
     except HTTPException:
         raise
@@ -102,17 +173,74 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail="Authentication system error"
         )
 
+def _refresh_token_from(body: Optional[RefreshTokenRequest], authorization: Optional[str]) -> str:
+    # Accept the token in the JSON body or as a bearer credential. Either way it must be
+    # the refresh_token returned by /token; access tokens are rejected.
+    if body is not None:
+        return body.refresh_token
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    raise HTTPException(status_code=400, detail="Refresh token not provided")
+
+@router.post("/refresh-token", response_model=TokenRefreshResponse)
+async def refresh_access_token(
+    body: Optional[RefreshTokenRequest] = Body(None),
+    authorization: Optional[str] = Header(None)
+):
+    try:
+        token = _refresh_token_from(body, authorization)
+        # A signature check and one indexed update; no password hashing
+        user, new_refresh_token = await refresh_tokens.rotate_refresh_token(token)
+        cache_principal(user)
+
+        return TokenRefreshResponse(
+            access_token=create_access_token(data=token_claims(user)),
+            refresh_token=new_refresh_token,
+            token_type="bearer"
+        )
+    except refresh_tokens.InvalidRefreshToken:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Token refresh error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Authentication system error")
+
+@router.post("/refresh-token/revoke")
+async def revoke_refresh_token(
+    body: Optional[RefreshTokenRequest] = Body(None),
+    authorization: Optional[str] = Header(None)
+):
+    try:
+        await refresh_tokens.revoke_refresh_token(_refresh_token_from(body, authorization))
+        return {"message": "Refresh token revoked"}
+    except refresh_tokens.InvalidRefreshToken:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Token revoke error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Authentication system error")
+
 @router.get("/profile", response_model=UserProfileResponse)
 async def get_user_profile(user_id: str = Depends(get_current_user)):
     try:
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await read_db.users.find_one({"_id": ObjectId(user_id)})
+        if not user and read_db is not db:
+            # A lagging secondary may not have a just-created account yet
+            user = await db.users.find_one({"_id": ObjectId(user_id)})
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
         return UserProfileResponse(
             username=user.get('username', ''),
-            email=user.get('email', '')
+            email=user.get('email', ''),
+            base_currency=user.get('base_currency') or settings.DEFAULT_CURRENCY
         )
     except HTTPException:
         raise
@@ -123,34 +251,64 @@ async def get_user_profile(user_id: str = Depends(get_current_user)):
             detail="Internal Server Error"
         )
 
-@router.delete("/users/me")
+@router.put("/profile/currency", response_model=UserProfileResponse)
+async def update_base_currency(
+    body: BaseCurrencyUpdate,
+    user_id: str = Depends(get_current_user),
+    current_user: UserProfileResponse = Depends(get_current_active_user)
+):
+    try:
+        try:
+            base_currency = fx.validate_currency(body.base_currency)
+        except fx.UnsupportedCurrency as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        await fx.set_base_currency(user_id, base_currency)
+        # Every summary and insight changes; the version bump retires their ETags everywhere
+        await data_versions.bump_version(user_id)
+        await insights_cache.invalidate(user_id)
+
+        return UserProfileResponse(
+            username=current_user.username,
+            email=current_user.email,
+            base_currency=base_currency
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating base currency: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error updating base currency")
+
+@router.delete("/users/me", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user(
     user_id: str = Depends(get_current_user),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserProfileResponse = Depends(get_current_active_user)
 ):
     try:
-        # Validate user exists
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Delete user's expenses
-        expenses_result = await db.expenses.delete_many({"user_id": user_id})
-        
-        # Delete user account
+        # Delete user account; sign-in stops working now, existing tokens on every
+        # worker within AUTH_REVOCATION_TTL_SECONDS
         user_result = await db.users.delete_one({"_id": ObjectId(user_id)})
-        
+        if user_result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="User not found")
+        await revoke_user_tokens(current_user.username, user_id)
+        await refresh_tokens.delete_user_refresh_tokens(user_id)
+        await data_versions.delete_user_version(user_id)
+        await insights_cache.invalidate(user_id)
+
+        # Expenses, rollups and tombstones can be large; they are removed in throttled batches
+        job_id = await job_runner.submit("delete_user", {"user_id": user_id})
+
         # Log deletion details
-        logger.info(f"User deleted: {current_user.username}")
-        logger.info(f"Expenses deleted: {expenses_result.deleted_count}")
+        logger.info(f"User deleted: {current_user.username}, data deletion job {job_id}")
         
         return {
-            "message": "User account and all associated data have been deleted successfully",
+            "message": "User account has been deleted; associated data is being removed",
             "details": {
                 "username": current_user.username,
-                "email": current_user.email,
-                "expenses_deleted": expenses_result.deleted_count
-            }
+                "email": current_user.email
+            },
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
         }
     except HTTPException:
         raise
@@ -166,51 +324,32 @@ async def create_expense(
     user_id: str = Depends(get_current_user)
 ):
     try:
-        # Validate amount
-        if expense.amount <= 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Amount must be greater than 0"
-            )
-
-        # Validate category
-        valid_categories = [
-            'food', 'transportation', 'entertainment', 
-            'shopping', 'utilities', 'health', 
-            'education', 'other'
-        ]
-        if expense.category.lower() not in valid_categories:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid category. Must be one of: {', '.join(valid_categories)}"
-            )
-
-        # Validate date
-        try:
-            expense_date = datetime.fromisoformat(expense.date.replace('Z', '+00:00'))
-            if expense_date > datetime.now() + timedelta(days=1):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Expense date cannot be in the future"
-                )
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid date format"
-            )
+        amount, category, expense_date, currency = validate_expense_fields(
+            expense.amount, expense.category, expense.date, expense.currency
+        )
 
         # Prepare expense data
         expense_data = {
             "description": expense.description.strip(),
-            "amount": float(expense.amount),
-            "category": expense.category.lower(),
+            "amount": amount,
+            "currency": currency,
+            "category": category,
             "date": expense_date,
-            "user_id": user_id
+            "user_id": user_id,
+            "updated_at": datetime.utcnow()
         }
 
-        # Insert expense
-        result = await db.expenses.insert_one(expense_data)
+        # Change sequence for delta sync; the data version, and with it every cached
+        # ETag, moves once the block has finished
+        async with data_versions.reserve_seq(user_id) as seq:
+            expense_data["seq"] = seq
+            result = await db.expenses.insert_one(expense_data)
+            events.publish_expenses(user_id, events.CREATED, [expense_data])
+            await rollups.record_expense(user_id, expense_date, expense_data["amount"], currency)
+            await suggestions.record_descriptions(user_id, [expense_data["description"]])
+        await insights_cache.invalidate(user_id)
         expense_data["id"] = str(result.inserted_id)
+        expense_data.pop("_id", None)
 
         return expense_data
 
@@ -223,30 +362,365 @@ async def create_expense(
             detail="Internal server error while creating expense"
         )
 
+async def _read_bulk_rows(request: Request) -> list:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Upload a CSV file in the 'file' field")
+        text = (await upload.read()).decode("utf-8-sig")
+        return list(csv.DictReader(io.StringIO(text)))
+    if content_type.startswith("text/csv"):
+        text = (await request.body()).decode("utf-8-sig")
+        return list(csv.DictReader(io.StringIO(text)))
+
+    try:
+        rows = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or a CSV file")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array of expenses")
+    return rows
+
+@router.post("/expenses/bulk", response_model=BulkImportResult)
+async def bulk_create_expenses(request: Request, user_id: str = Depends(get_current_user)):
+    try:
+        rows = await _read_bulk_rows(request)
+        if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many rows. At most {settings.BULK_IMPORT_MAX_ROWS} can be imported at once"
+            )
+
+        # Validate every row up front with the same rules as create_expense
+        errors = []
+        documents = []
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append(BulkImportError(index=index, detail="Row must be an object"))
+                continue
+            try:
+                amount, category, expense_date, currency = validate_expense_fields(
+                    row.get("amount"), row.get("category"), row.get("date"), row.get("currency")
+                )
+            except HTTPException as e:
+                errors.append(BulkImportError(index=index, detail=e.detail))
+                continue
+            documents.append((index, {
+                "description": str(row.get("description") or "").strip(),
+                "amount": amount,
+                "currency": currency,
+                "category": category,
+                "date": expense_date,
+                "user_id": user_id
+            }))
+
+        inserted = []
+        if documents:
+            # One change sequence number per row in a single reservation; delta sync
+            # sees none of them until every chunk and the rollups are written
+            async with data_versions.reserve_seq(user_id, count=len(documents)) as first_seq:
+                now = datetime.utcnow()
+                for position, (_, doc) in enumerate(documents):
+                    doc["seq"] = first_seq + position
+                    doc["updated_at"] = now
+
+                # Write in unordered chunks so one bad document does not stop the rest
+                chunk_size = settings.BULK_INSERT_CHUNK_SIZE
+                for offset in range(0, len(documents), chunk_size):
+                    chunk = documents[offset:offset + chunk_size]
+                    failed = {}
+                    try:
+                        await db.expenses.insert_many([doc for _, doc in chunk], ordered=False)
+                    except BulkWriteError as e:
+                        for write_error in e.details.get("writeErrors", []):
+                            failed[write_error["index"]] = write_error.get("errmsg", "Write failed")
+                    for position, (index, doc) in enumerate(chunk):
+                        if position in failed:
+                            errors.append(BulkImportError(index=index, detail=failed[position]))
+                        else:
+                            inserted.append(doc)
+
+                if inserted:
+                    events.publish_expenses(user_id, events.CREATED, inserted)
+                    await rollups.record_expenses(user_id, inserted)
+                    await suggestions.record_descriptions(user_id, (doc["description"] for doc in inserted))
+            await insights_cache.invalidate(user_id)
+
+        errors.sort(key=lambda error: error.index)
+        return BulkImportResult(inserted=len(inserted), failed=len(errors), errors=errors)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing expenses: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error while importing expenses"
+        )
+
 @router.get("/expenses", response_model=list[Expense])
 @router.get("/expenses/", response_model=list[Expense])
-async def get_expenses(user_id: str = Depends(get_current_user)):
+async def get_expenses(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    category: Optional[list[ExpenseCategory]] = Query(None),
+    order: SortOrder = SortOrder.asc,
+    user_id: str = Depends(get_current_user)
+):
     try:
-        cursor = db.expenses.find({"user_id": user_id})
-        expenses = []
-        async for doc in cursor:
-            # Convert MongoDB _id to string id
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            # The date is already a datetime object from MongoDB
-            expenses.append(Expense(**doc))
-        return expenses
+        async with read_session() as session:
+            # Unchanged data answers with 304 before any query or serialisation
+            version = await data_versions.get_version(user_id, session=session)
+            etag = make_etag(user_id, version, "list", str(request.query_params))
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            headers = etag_headers(etag)
+
+            query = build_expense_filter(user_id, start, end, category)
+            descending = order == SortOrder.desc
+
+            # Resume after the last row of the previous page
+            if after:
+                try:
+                    after_date, after_id = decode_cursor(after)
+                except InvalidCursor as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                query.update(keyset_filter(after_date, after_id, descending))
+
+            direction = -1 if descending else 1
+            cursor = read_db.expenses.find(query, EXPENSE_PROJECTION, session=session) \
+                .sort([("date", direction), ("_id", direction)])
+            if limit:
+                # Fetch one extra row to know whether another page exists
+                cursor = cursor.limit(limit + 1)
+
+            # Database rows are trusted: map them straight to JSON-ready dicts and encode once,
+            # skipping per-row model construction and response_model re-validation
+            expenses = []
+            last_key = None
+            async for doc in cursor:
+                if limit and len(expenses) == limit:
+                    headers["X-Next-Cursor"] = encode_cursor(*last_key)
+                    break
+                last_key = (doc["date"], doc["_id"])
+                expenses.append(expense_to_dict(doc))
+            return FastJSONResponse(expenses, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching expenses: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/expenses/summary", response_model=ExpenseSummary)
+async def get_expense_summary(
+    group_by: SummaryGroupBy = SummaryGroupBy.day,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    category: Optional[list[ExpenseCategory]] = Query(None),
+    user_id: str = Depends(get_current_user)
+):
+    try:
+        if start and end and start >= end:
+            raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+
+        # Totals are reported in the user's base currency
+        currency = await fx.get_base_currency(user_id)
+        rows = await summary.summarize_expenses(
+            user_id, group_by.value, start, end, category, currency=currency
+        )
+
+        summary_rows = []
+        for row in rows:
+            key = row["key"]
+            summary_rows.append(ExpenseSummaryRow(
+                key=key.date().isoformat() if isinstance(key, datetime) else str(key),
+                total=row["total"],
+                count=row["count"],
+                average=row["total"] / max(row["count"], 1)
+            ))
+
+        return ExpenseSummary(
+            group_by=group_by,
+            currency=currency,
+            total=sum(row.total for row in summary_rows),
+            count=sum(row.count for row in summary_rows),
+            rows=summary_rows
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarizing expenses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error summarizing expenses")
+
+@router.get("/expenses/export")
+async def export_expenses(
+    format: ExportFormat = ExportFormat.csv,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    category: Optional[list[ExpenseCategory]] = Query(None),
+    batch_size: Optional[int] = Query(None, ge=1, le=10000),
+    user_id: str = Depends(get_current_user)
+):
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    query = build_expense_filter(user_id, start, end, category)
+
+    # Rows are streamed straight off the cursor, so memory stays flat regardless of history size
+    cursor = db.expenses.find(query, export.EXPORT_PROJECTION) \
+        .sort([("date", 1), ("_id", 1)]) \
+        .batch_size(batch_size)
+
+    if format == ExportFormat.csv:
+        body = export.iter_csv(cursor, batch_size)
+        media_type = "text/csv"
+    else:
+        body = export.iter_ndjson(cursor, batch_size)
+        media_type = "application/x-ndjson"
+
+    filename = f"expenses-{datetime.now().strftime('%Y%m%d')}.{format.value}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/expenses/changes", response_model=ExpenseChanges)
+async def get_expense_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=settings.MAX_PAGE_SIZE),
+    user_id: str = Depends(get_current_user)
+):
+    try:
+        try:
+            changes = await sync.get_changes(user_id, since, limit)
+        except sync.InvalidSyncToken as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        updated = []
+        for doc in changes["updated"]:
+            doc["id"] = str(doc.pop("_id"))
+            updated.append(Expense(**doc))
+
+        return ExpenseChanges(
+            updated=updated,
+            deleted=changes["deleted"],
+            next_token=changes["token"],
+            has_more=changes["has_more"],
+            reset=changes["reset"]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching expense changes: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error fetching expense changes")
+
+@router.get("/expenses/search", response_model=list[ExpenseSearchResult])
+async def search_expenses(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=settings.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=settings.SEARCH_MAX_OFFSET),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    category: Optional[list[ExpenseCategory]] = Query(None),
+    user_id: str = Depends(get_current_user)
+):
+    try:
+        async with read_session() as session:
+            version = await data_versions.get_version(user_id, session=session)
+            etag = make_etag(user_id, version, "search", str(request.query_params))
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            headers = etag_headers(etag)
+
+            # The text index is prefixed with user_id, so only this user's entries are scanned.
+            # Best matches first; ties fall back to the newest expense
+            query = {**build_expense_filter(user_id, start, end, category), "$text": {"$search": q}}
+            score = {"$meta": "textScore"}
+            cursor = read_db.expenses.find(query, {**EXPENSE_PROJECTION, "score": score}, session=session) \
+                .sort([("score", score), ("date", -1), ("_id", -1)]) \
+                .skip(offset) \
+                .limit(limit + 1)
+
+            results = []
+            async for doc in cursor:
+                if len(results) == limit:
+                    headers["X-Next-Offset"] = str(offset + limit)
+                    break
+                result = expense_to_dict(doc)
+                result["score"] = round(doc["score"], 4)
+                results.append(result)
+            return FastJSONResponse(results, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching expenses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error searching expenses")
+
+@router.get("/expenses/suggest", response_model=list[DescriptionSuggestion])
+async def suggest_descriptions(
+    prefix: str = Query("", max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(get_current_user)
+):
+    try:
+        # Served from an in-memory prefix index, loaded once per user and kept current on write
+        async with read_session() as session:
+            return FastJSONResponse(
+                await suggestions.suggest(user_id, prefix, limit, database=read_db, session=session)
+            )
+    except Exception as e:
+        logger.error(f"Error suggesting descriptions: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error suggesting descriptions")
+
+@router.get("/expenses/stream", response_class=StreamingResponse)
+async def stream_expense_events(
+    last_event_id: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user)
+):
+    # Server-sent events for the user's expense creates, updates and deletes
+    try:
+        stream = events.open_stream(user_id, last_event_id)
+    except events.TooManyStreams as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _expense_object_id(expense_id: str) -> ObjectId:
+    # A malformed id can't match any expense
+    if not ObjectId.is_valid(expense_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    return ObjectId(expense_id)
+
 @router.get("/expenses/{expense_id}", response_model=Expense)
-async def get_expense(expense_id: str, user_id: str = Depends(get_current_user)):
+async def get_expense(
+    expense_id: str,
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user)
+):
     try:
-        expense = await db.expenses.find_one({
-            "_id": ObjectId(expense_id),
-            "user_id": user_id
-        })
+        query = {"_id": _expense_object_id(expense_id), "user_id": user_id}
+        async with read_session() as session:
+            version = await data_versions.get_version(user_id, session=session)
+            etag = make_etag(user_id, version, "expense", expense_id)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            set_etag(response, etag)
+
+            expense = await read_db.expenses.find_one(query, session=session)
+        if not expense and read_db is not db:
+            # Not on the secondary yet; the primary has the final say before a 404
+            expense = await db.expenses.find_one(query)
         
         if not expense:
             raise HTTPException(
@@ -261,6 +735,8 @@ async def get_expense(expense_id: str, user_id: str = Depends(get_current_user))
         # The date is already a datetime object from MongoDB
         return Expense(**expense)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching expense: {str(e)}")
         raise HTTPException(
@@ -277,7 +753,7 @@ async def update_expense(
     try:
         # Validate expense exists and belongs to user
         existing_expense = await db.expenses.find_one({
-            "_id": ObjectId(expense_id),
+            "_id": _expense_object_id(expense_id),
             "user_id": user_id
         })
 
@@ -287,60 +763,51 @@ async def update_expense(
                 detail="Expense not found or does not belong to user"
             )
 
-        # Validate amount
-        if expense.amount <= 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Amount must be greater than 0"
-            )
-
-        # Validate category
-        valid_categories = [
-            'food', 'transportation', 'entertainment', 
-            'shopping', 'utilities', 'health', 
-            'education', 'other'
-        ]
-        if expense.category.lower() not in valid_categories:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid category. Must be one of: {', '.join(valid_categories)}"
-            )
-
-        # Validate date
-        try:
-            expense_date = datetime.fromisoformat(expense.date.replace('Z', '+00:00'))
-            if expense_date > datetime.now() + timedelta(days=1):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Expense date cannot be in the future"
-                )
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid date format"
-            )
+        amount, category, expense_date, currency = validate_expense_fields(
+            expense.amount, expense.category, expense.date, expense.currency or existing_expense.get("currency")
+        )
 
         # Update expense
         update_data = {
             "description": expense.description.strip(),
-            "amount": float(expense.amount),
-            "category": expense.category.lower(),
+            "amount": amount,
+            "currency": currency,
+            "category": category,
             "date": expense_date,
         }
 
-        result = await db.expenses.update_one(
-            {"_id": ObjectId(expense_id)},
-            {"$set": update_data}
-        )
-
-        if result.modified_count == 0:
+        if all(existing_expense.get(field) == value for field, value in update_data.items()):
             raise HTTPException(
                 status_code=400,
                 detail="No changes made to expense"
             )
 
-        # Get updated expense
-        updated_expense = await db.expenses.find_one({"_id": ObjectId(expense_id)})
+        async with data_versions.reserve_seq(user_id) as seq:
+            update_data["seq"] = seq
+            update_data["updated_at"] = datetime.utcnow()
+            await db.expenses.update_one(
+                {"_id": existing_expense["_id"]},
+                {"$set": update_data}
+            )
+
+            await rollups.move_expense(
+                user_id,
+                existing_expense["date"],
+                existing_expense["amount"],
+                existing_expense.get("currency"),
+                expense_date,
+                update_data["amount"],
+                currency
+            )
+            if existing_expense.get("description") != update_data["description"]:
+                await suggestions.move_description(
+                    user_id, existing_expense.get("description"), update_data["description"]
+                )
+
+            # Get updated expense
+            updated_expense = await db.expenses.find_one({"_id": existing_expense["_id"]})
+            events.publish_expenses(user_id, events.UPDATED, [updated_expense])
+        await insights_cache.invalidate(user_id)
         updated_expense["id"] = str(updated_expense.pop("_id"))
 
         return updated_expense
@@ -357,19 +824,28 @@ async def update_expense(
 @router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: str, user_id: str = Depends(get_current_user)):
     try:
-        result = await db.expenses.delete_one({
-            "_id": ObjectId(expense_id),
-            "user_id": user_id
-        })
+        deleted = await db.expenses.find_one_and_delete(
+            {"_id": _expense_object_id(expense_id), "user_id": user_id},
+            projection={"amount": 1, "currency": 1, "date": 1, "description": 1}
+        )
 
-        if result.deleted_count == 0:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Expense not found"
             )
 
+        async with data_versions.reserve_seq(user_id) as seq:
+            await sync.record_deletion(user_id, deleted["_id"], seq)
+            events.publish_deletion(user_id, deleted["_id"], seq)
+            await rollups.unrecord_expense(user_id, deleted["date"], deleted["amount"], deleted.get("currency"))
+            await suggestions.unrecord_description(user_id, deleted.get("description"))
+        await insights_cache.invalidate(user_id)
+
         return {"message": "Expense deleted successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error deleting expense: {str(e)}")
         raise HTTPException(
@@ -378,7 +854,7 @@ async def delete_expense(expense_id: str, user_id: str = Depends(get_current_use
         )
 
 # Admin endpoints
-@router.post("/admin/clear-users")
+@router.post("/admin/clear-users", status_code=status.HTTP_202_ACCEPTED)
 async def clear_all_users(request: ClearUsersRequest):
     try:
         # Verify admin password
@@ -388,92 +864,159 @@ async def clear_all_users(request: ClearUsersRequest):
         if request.confirmation.lower() != "confirm":
             raise HTTPException(status_code=400, detail="Confirmation not provided")
         
-        # Delete all collections related to user data
-        await db.users.delete_many({})
-        await db.expenses.delete_many({})
+        # Delete all collections related to user data, in throttled batches
+        job_id = await job_runner.submit("clear_all", {})
+        await revoke_all_tokens()
+        await insights_cache.clear()
         
         return {
-            "message": "All user data has been cleared successfully",
-            "collections_cleared": ["users", "expenses"]
+            "message": "All user data is being cleared",
+            "collections": [
+                "users", "refresh_tokens", "expenses", "expense_rollups", "expense_tombstones", "data_versions",
+                "description_suggestions"
+            ],
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error clearing users: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error clearing user data")
 
+# Background jobs. Job ids are random and only ever returned to whoever started the
+# job, and the status omits its parameters, so no login is needed to follow one:
+# a deleted account can still watch its data being removed.
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    try:
+        job = await jobs.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return jobs.job_to_dict(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching job: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error fetching job")
+
+@router.get("/admin/jobs", dependencies=[Depends(require_admin)])
+async def get_job_runner_stats():
+    return job_runner.stats()
+
+@router.get("/admin/auth-cache", dependencies=[Depends(require_admin)])
+async def get_auth_cache_stats():
+    return auth_cache_stats()
+
+@router.get("/admin/password-hashing", dependencies=[Depends(require_admin)])
+async def get_password_hashing_stats():
+    return password_hasher.stats()
+
+@router.get("/admin/admission", dependencies=[Depends(require_admin)])
+async def get_admission_stats():
+    return admission_stats()
+
+@router.get("/admin/insights-cache", dependencies=[Depends(require_admin)])
+async def get_insights_cache_stats():
+    return insights_cache.stats()
+
+@router.get("/admin/suggestions-cache", dependencies=[Depends(require_admin)])
+async def get_suggestions_cache_stats():
+    return suggestions.cache_stats()
+
+@router.get("/admin/fx", dependencies=[Depends(require_admin)])
+async def get_fx_stats():
+    return {**fx_rates.stats(), "currency_codes": fx_rates.table.currencies()}
+
+@router.post("/admin/fx/reload", dependencies=[Depends(require_admin)])
+async def reload_fx_rates():
+    # This worker only; the others pick the change up within FX_REFRESH_SECONDS
+    try:
+        await fx_rates.refresh(force=True)
+        return fx_rates.stats()
+    except Exception as e:
+        logger.error(f"Error reloading exchange rates: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error reloading exchange rates: {str(e)}")
+
+@router.get("/admin/event-streams", dependencies=[Depends(require_admin)])
+async def get_event_stream_stats():
+    return {**events.event_hub.stats(), "change_stream_errors": events.change_stream_watcher.errors}
+
+@router.get("/admin/db-pool", dependencies=[Depends(require_admin)])
+async def get_db_pool_stats():
+    return {
+        **pool_listener.stats(),
+        "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+        "read_routing": settings.MONGO_READ_ROUTING,
+    }
+
+async def _read_insights(read, user_id: str, currency: str, after: Optional[tuple]) -> dict:
+    # Runs as the computation every coalesced request waits on, which may outlive the
+    # request that started it, so it reads in a session of its own, picking up where
+    # that request's reads left off
+    async with read_session(after=after) as session:
+        return await read(user_id, currency, database=read_db, session=session)
+
 # Expense insights endpoint
-@router.get("/expense-insights", response_model=dict)
-async def get_expense_insights(user_id: str = Depends(get_current_user)):
+@router.get("/expense-insights", response_model=dict, dependencies=[Depends(admit_by_user("insights"))])
+async def get_expense_insights(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user)
+):
     try:
-        # Get all expenses for the current user
-        cursor = db.expenses.find({"user_id": user_id})
-        expenses = []
-        async for doc in cursor:
-            # Convert MongoDB _id to string id
-            doc["id"] = str(doc["_id"])
-            del doc["_id"]
-            # The date is already a datetime object from MongoDB
-            expenses.append(Expense(**doc))
-        
-        if not expenses:
-            return {
-                "total_monthly_expense": 0,
-                "average_monthly_expense": 0,
-                "average_weekly_expense": 0,
-                "daily_insights": []
-            }
-        
-        # Calculate monthly insights
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        monthly_expenses = [
-            exp for exp in expenses 
-            if exp.date.month == current_month and exp.date.year == current_year
-        ]
-        
-        total_monthly_expense = sum(exp.amount for exp in monthly_expenses)
-        average_monthly_expense = total_monthly_expense / max(len(monthly_expenses), 1)
-        
-        # Calculate weekly insights
-        weekly_expenses = [
-            exp for exp in expenses 
-            if (datetime.now() - exp.date).days <= 7
-        ]
-        average_weekly_expense = sum(exp.amount for exp in weekly_expenses) / max(len(weekly_expenses), 1)
-        
-        # Daily insights with performance tracking
-        daily_expenses = {}
-        for exp in expenses:
-            date_key = exp.date.date()
-            daily_expenses[date_key] = daily_expenses.get(date_key, 0) + exp.amount
-        
-        # Sort daily expenses by date
-        sorted_daily_expenses = sorted(daily_expenses.items())
-        
-        # Prepare daily insights with performance tracking
-        daily_insights = []
-        for i in range(1, len(sorted_daily_expenses)):
-            prev_day, prev_amount = sorted_daily_expenses[i-1]
-            curr_day, curr_amount = sorted_daily_expenses[i]
-            
-            # Calculate average of previous days
-            avg_before_curr_day = sum(
-                amount for day, amount in sorted_daily_expenses[:i]
-            ) / i
-            
-            insight = {
-                "date": curr_day.isoformat(),
-                "amount": curr_amount,
-                "performance": "below_average" if curr_amount < avg_before_curr_day else "above_average",
-                "difference_percentage": abs((curr_amount - avg_before_curr_day) / avg_before_curr_day * 100) if avg_before_curr_day > 0 else 0
-            }
-            daily_insights.append(insight)
-        
-        return {
-            "total_monthly_expense": total_monthly_expense,
-            "average_monthly_expense": average_monthly_expense,
-            "average_weekly_expense": average_weekly_expense,
-            "daily_insights": daily_insights
-        }
+        async with read_session() as session:
+            # Insights depend on today's date, the base currency and the exchange rates as well as the data
+            currency = await fx.get_base_currency(user_id)
+            stamp = (
+                await data_versions.get_version(user_id, session=session),
+                datetime.now().date().isoformat(), currency, fx_rates.table.version
+            )
+            etag = make_etag(user_id, stamp[0], "insights", *stamp[1:])
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            set_etag(response, etag)
+
+            # Built from the daily/monthly summaries, so only aggregated rows leave the database
+            after = causal_point(session)
+            return await insights_cache.get_or_compute(
+                user_id, "insights", stamp,
+                lambda: _read_insights(summary.get_insights, user_id, currency, after)
+            )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching expense insights: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error fetching expense insights")
+
+@router.get(
+    "/expense-insights/advanced", response_model=dict, dependencies=[Depends(admit_by_user("insights"))]
+)
+async def get_advanced_expense_insights(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user)
+):
+    try:
+        async with read_session() as session:
+            currency = await fx.get_base_currency(user_id)
+            stamp = (
+                await data_versions.get_version(user_id, session=session),
+                datetime.now().date().isoformat(), currency, fx_rates.table.version
+            )
+            etag = make_etag(user_id, stamp[0], "insights-advanced", *stamp[1:])
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            set_etag(response, etag)
+
+            # Rolling windows, month-over-month change, forecast and anomalies, computed with NumPy
+            after = causal_point(session)
+            return await insights_cache.get_or_compute(
+                user_id, "advanced", stamp,
+                lambda: _read_insights(analytics.get_advanced_insights, user_id, currency, after)
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching advanced expense insights: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error fetching advanced expense insights")
@@ -8,9 +8,94 @@ class Settings:
     PROJECT_VERSION: str = "1.0.0"
     MONGODB_URL: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     DB_NAME: str = os.getenv("DATABASE_NAME", "chillbills")
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))  # 0 = no limit
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))  # 0 = no limit
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000"))
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))  # 0 = no limit
+    MONGO_READ_ROUTING: str = os.getenv("MONGO_READ_ROUTING", "primary")  # primary | secondaryPreferred
+    MONGO_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "90"))  # >= 90, or -1
     ADMIN_CLEAR_PASSWORD: str = os.getenv("ADMIN_CLEAR_PASSWORD", "")
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+    JWT_EMBED_USER_ID: bool = os.getenv("JWT_EMBED_USER_ID", "false").lower() == "true"
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_REVOCATION_TTL_SECONDS: float = float(os.getenv("AUTH_REVOCATION_TTL_SECONDS", "5"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", "8"))
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")  # e.g. "pymongo=WARNING,app.api=DEBUG"
+    LOG_JSON: bool = os.getenv("LOG_JSON", "false").lower() == "true"
+    LOG_DIR: str = os.getenv("LOG_DIR", "")
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "500"))
+    DATA_VERSION_CACHE_SIZE: int = int(os.getenv("DATA_VERSION_CACHE_SIZE", "10000"))
+    DATA_VERSION_CACHE_TTL_SECONDS: float = float(os.getenv("DATA_VERSION_CACHE_TTL_SECONDS", "1"))
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+    # A write still unfinished after this long is treated as abandoned by delta sync
+    SYNC_RESERVATION_TIMEOUT_SECONDS: float = float(os.getenv("SYNC_RESERVATION_TIMEOUT_SECONDS", "300"))
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    BULK_INSERT_CHUNK_SIZE: int = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+    BULK_IMPORT_MAX_ROWS: int = int(os.getenv("BULK_IMPORT_MAX_ROWS", "50000"))
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))  # 0 = one per CPU
+    SERVER_DRAIN_DELAY_SECONDS: float = float(os.getenv("SERVER_DRAIN_DELAY_SECONDS", "5"))
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    WARMUP_MONGO_CONNECTIONS: int = int(os.getenv("WARMUP_MONGO_CONNECTIONS", "10"))
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    # route=max concurrent/max queued; routes: token, users, insights
+    ADMISSION_LIMITS: str = os.getenv("ADMISSION_LIMITS", "token=16/64,users=8/32,insights=32/128")
+    # route=requests per minute/burst, per client IP (token, users) or per user (insights)
+    RATE_LIMITS: str = os.getenv("RATE_LIMITS", "token=30/10,users=10/5,insights=120/30")
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+    ADMISSION_RETRY_AFTER_SECONDS: int = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    REQUEST_ID_HEADER: str = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    INSIGHTS_CACHE_ENABLED: bool = os.getenv("INSIGHTS_CACHE_ENABLED", "true").lower() == "true"
+    INSIGHTS_CACHE_BACKEND: str = os.getenv("INSIGHTS_CACHE_BACKEND", "memory")
+    INSIGHTS_CACHE_SIZE: int = int(os.getenv("INSIGHTS_CACHE_SIZE", "10000"))  # users
+    INSIGHTS_CACHE_TTL_SECONDS: float = float(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", "300"))
+    SEARCH_MAX_OFFSET: int = int(os.getenv("SEARCH_MAX_OFFSET", "1000"))
+    SUGGEST_MAX_DESCRIPTIONS: int = int(os.getenv("SUGGEST_MAX_DESCRIPTIONS", "1000"))  # per user
+    SUGGEST_CACHE_SIZE: int = int(os.getenv("SUGGEST_CACHE_SIZE", "10000"))  # users
+    SUGGEST_CACHE_TTL_SECONDS: float = float(os.getenv("SUGGEST_CACHE_TTL_SECONDS", "60"))
+    DEFAULT_CURRENCY: str = os.getenv("DEFAULT_CURRENCY", "USD")  # expenses and users that name none
+    FX_REFERENCE_CURRENCY: str = os.getenv("FX_REFERENCE_CURRENCY", "USD")  # rates are quoted against this
+    FX_RATES_FILE: str = os.getenv("FX_RATES_FILE", "")  # CSV; the fx_rates collection when unset
+    FX_REFRESH_SECONDS: float = float(os.getenv("FX_REFRESH_SECONDS", "300"))
+    FX_MEMO_SIZE: int = int(os.getenv("FX_MEMO_SIZE", "100000"))  # (currency, target, day) factors
+    STREAM_SOURCE: str = os.getenv("STREAM_SOURCE", "auto")  # auto, change_stream or local
+    STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+    STREAM_RETRY_MS: int = int(os.getenv("STREAM_RETRY_MS", "3000"))  # client reconnect delay
+    STREAM_MAX_CONNECTIONS: int = int(os.getenv("STREAM_MAX_CONNECTIONS", "10000"))  # per worker
+    STREAM_MAX_CONNECTIONS_PER_USER: int = int(os.getenv("STREAM_MAX_CONNECTIONS_PER_USER", "10"))
+    STREAM_MAX_BUFFER_BYTES: int = int(os.getenv("STREAM_MAX_BUFFER_BYTES", "65536"))  # per connection
+    STREAM_REPLAY_LIMIT: int = int(os.getenv("STREAM_REPLAY_LIMIT", "500"))
+    ANALYTICS_LOOKBACK_DAYS: int = int(os.getenv("ANALYTICS_LOOKBACK_DAYS", "400"))
+    ANALYTICS_SERIES_DAYS: int = int(os.getenv("ANALYTICS_SERIES_DAYS", "90"))
+    ANALYTICS_ZSCORE_THRESHOLD: float = float(os.getenv("ANALYTICS_ZSCORE_THRESHOLD", "3"))
+    JOB_BATCH_SIZE: int = int(os.getenv("JOB_BATCH_SIZE", "1000"))
+    JOB_BATCH_DELAY_SECONDS: float = float(os.getenv("JOB_BATCH_DELAY_SECONDS", "0.1"))
+    JOB_MAX_CONCURRENCY: int = int(os.getenv("JOB_MAX_CONCURRENCY", "2"))  # per worker
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "5"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETENTION_DAYS: int = int(os.getenv("JOB_RETENTION_DAYS", "7"))
 
 settings = Settings()
@@ -1,9 +1,77 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
 import motor.motor_asyncio
+from pymongo.read_preferences import SecondaryPreferred
+
 from .config import settings
+from .metrics import command_listener, pool_listener
+
 
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL)
+def _client_options() -> dict:
+    # Explicit keyword options take precedence over the same options in MONGO_URI
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+    }
+    # 0 keeps the driver default of "no limit"
+    if settings.MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = settings.MONGO_SOCKET_TIMEOUT_MS
+    return options
+
+
+client = motor.motor_asyncio.AsyncIOMotorClient(
+    settings.MONGODB_URL,
+    event_listeners=[pool_listener] + ([command_listener] if settings.METRICS_ENABLED else []),
+    **_client_options()
+)
 db = client[settings.DB_NAME]
 
+# Handle for read-only endpoints; the same object as `db` unless read routing is on.
+# Writes, and reads that must see them, stay on the primary through `db`.
+if settings.MONGO_READ_ROUTING == "secondaryPreferred":
+    read_db = db.with_options(
+        read_preference=SecondaryPreferred(max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
+    )
+else:
+    read_db = db
+
+
+@asynccontextmanager
+async def read_session(after: Optional[tuple] = None):
+    # Secondaries may lag. Reads made in one causally consistent session never see
+    # an older state than an earlier read in that session, so an endpoint that reads
+    # its data version first and its data second never labels stale data with a
+    # newer ETag. Yields None when reads go to the primary.
+    #
+    # `after` is a causal_point() of another session: reads in this one then never
+    # see an older state than that session's reads had.
+    if read_db is db:
+        yield None
+        return
+    async with await client.start_session(causal_consistency=True) as session:
+        cluster_time, operation_time = after or (None, None)
+        if cluster_time is not None:
+            session.advance_cluster_time(cluster_time)
+        if operation_time is not None:
+            session.advance_operation_time(operation_time)
+        yield session
+
+
+def causal_point(session) -> Optional[tuple]:
+    # How far a read_session() has got, for continuing in another session after it
+    # has closed (see read_session's `after`)
+    if session is None:
+        return None
+    return session.cluster_time, session.operation_time
+
+
 async def test_db_connection():
     try:
         await client.admin.command('ping')
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+
+from .config import settings
+from .database import client, test_db_connection
+from .migrations import run_migrations
+from ..services.fx import fx_rates
+from ..utils.passwords import password_hasher
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    # Per worker process. /readyz answers 200 only between a finished warm-up and the
+    # first shutdown signal, so a load balancer stops routing to a worker before it
+    # stops accepting connections.
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+
+    def mark_ready(self):
+        self.ready = True
+
+    def mark_draining(self):
+        self.draining = True
+
+    def status(self) -> str:
+        if self.draining:
+            return "draining"
+        return "ready" if self.ready else "starting"
+
+
+readiness = Readiness()
+
+
+async def warm_up(app):
+    # Everything the first requests would otherwise pay for
+    if not await test_db_connection():
+        logger.error("Failed to connect to the database")
+        raise Exception("Database connection failed")
+    logger.info("Successfully connected to the database")
+
+    version = await run_migrations()
+    logger.info(f"Database schema is at version {version}")
+
+    await fx_rates.refresh()
+
+    # Concurrent pings each check out their own connection, filling the pool
+    connections = min(settings.WARMUP_MONGO_CONNECTIONS, settings.MONGO_MAX_POOL_SIZE)
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(connections)))
+
+    await password_hasher.warm_up()
+
+    # FastAPI builds and caches the OpenAPI schema on first use
+    app.openapi()
+
+    readiness.mark_ready()
+    logger.info(f"Warm-up complete ({connections} database connections opened)")
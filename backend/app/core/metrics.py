@@ -0,0 +1,302 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Minimal Prometheus-style metrics. Recording is a lock, a dict lookup and a few
+# additions, cheap enough to leave on in production. Pymongo listeners run on
+# Motor's executor threads, hence the locks.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ASGI scope of the request being served, so Mongo commands can be attributed to a route
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(labels, (list(series[0]), series[1], series[2])) for labels, series in self._values.items()]
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name: str, documentation: str, collect: Callable[[], dict], kind: str = "gauge"):
+        # `collect` returns {label value or "": number}; sampled only when /metrics is scraped
+        self._collectors.append((name, documentation, collect, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, documentation, collect, kind in self._collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in collect().items():
+                label = f'{{name="{_escape(key)}"}}' if key else ""
+                lines.append(f"{name}{label} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)
+))
+mongodb_command_duration_seconds = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and route",
+    ("command", "collection", "route")
+))
+mongodb_command_failures_total = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and route",
+    ("command", "collection", "route")
+))
+
+
+def route_template(scope: Optional[dict]) -> str:
+    # Label by route template, never by raw path, to keep label cardinality bounded
+    if scope is None:
+        return "none"
+    cached = scope.get("metrics.route")
+    if cached:
+        return cached
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None and scope.get("app") is not None:
+        for candidate in getattr(scope["app"], "routes", []):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                template = candidate.path
+                break
+    template = template or "unmatched"
+    scope["metrics.route"] = template
+    return template
+
+
+class MetricsMiddleware:
+    # Pure ASGI middleware: no per-request task or stream wrapping
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Resolved after the router has run, so the matched route is usually already in scope
+            route = route_template(scope)
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, route)
+            http_requests_total.inc(method, route, str(status_holder[0]))
+            http_requests_in_flight.dec(method)
+            current_scope.reset(token)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        route = route_template(current_scope.get())
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, route)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), ("", "none"))
+
+    def succeeded(self, event):
+        collection, route = self._finish(event)
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1e6, event.command_name, collection, route
+        )
+
+    def failed(self, event):
+        collection, route = self._finish(event)
+        mongodb_command_duration_seconds.observe(
+            event.duration_micros / 1e6, event.command_name, collection, route
+        )
+        mongodb_command_failures_total.inc(event.command_name, collection, route)
+
+
+command_listener = MongoCommandListener()
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    # Connection pool (CMAP) events folded into per-server counts, sampled on scrape
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _pool(self, address):
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools[address] = {
+                "open": 0, "checked_out": 0, "waiting": 0, "checkouts": 0,
+                "checkout_failures": 0, "checkout_timeouts": 0, "cleared": 0,
+            }
+        return pool
+
+    def _update(self, address, **deltas):
+        with self._lock:
+            pool = self._pool(address)
+            for key, delta in deltas.items():
+                pool[key] += delta
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event):
+        self._update(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        timed_out = int(event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT)
+        self._update(event.address, waiting=-1, checkout_failures=1, checkout_timeouts=timed_out)
+
+    def connection_checked_out(self, event):
+        self._update(event.address, waiting=-1, checked_out=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, checked_out=-1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            servers = {f"{host}:{port}": dict(pool) for (host, port), pool in self._pools.items()}
+        totals = {key: sum(pool[key] for pool in servers.values()) for key in (
+            "open", "checked_out", "waiting", "checkouts", "checkout_failures", "checkout_timeouts", "cleared"
+        )}
+        return {**totals, "servers": servers}
+
+
+pool_listener = MongoPoolListener()
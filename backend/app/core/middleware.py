@@ -0,0 +1,184 @@
+import re
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Optional
+
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Pure ASGI middleware: each one wraps `send` at most, with no per-request task
+# or body stream copies the way BaseHTTPMiddleware does.
+
+# Request id of the request being served, for log records and error responses
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class RequestIdMiddleware:
+    # Reuses a well-formed incoming X-Request-ID so ids line up across proxies,
+    # otherwise mints one; echoed on the response and stored in request.state
+    def __init__(self, app, header_name: str = settings.REQUEST_ID_HEADER):
+        self.app = app
+        self.header_name = header_name.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = _header(scope, self.header_name)
+        incoming = incoming.decode("latin-1") if incoming else ""
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+        encoded = request_id.encode("latin-1")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *[(k, v) for k, v in message.get("headers", []) if k != self.header_name],
+                    (self.header_name, encoded),
+                ]
+            await send(message)
+
+        # Not reset on exit: the 500 handler runs outside this middleware and still needs it
+        request_id_var.set(request_id)
+        await self.app(scope, receive, send_wrapper)
+
+
+# Only text-like bodies shrink enough to be worth the CPU
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "text/", "application/javascript", "application/xml",
+)
+
+
+def _accepted_encoding(scope) -> Optional[str]:
+    accept = (_header(scope, b"accept-encoding") or b"").decode("latin-1").lower()
+    offered = {}
+    for item in accept.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._brotli = None
+            self._zlib = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flushed per chunk so a streamed export reaches the client as it is produced
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    # gzip, or brotli when the package is installed and the client accepts it, for
+    # responses of at least `minimum_size` bytes. Streamed responses (exports) are
+    # compressed chunk by chunk; their size is unknown, so they always qualify.
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = _accepted_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = next((v for k, v in headers if k == b"content-type"), b"").decode("latin-1")
+                if (
+                    message["status"] < 200 or message["status"] in (204, 304)
+                    or any(k == b"content-encoding" for k, _ in headers)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    # Event streams must reach the client as each event is written
+                    or content_type.startswith("text/event-stream")
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Held back until the first body chunk shows whether compression pays off
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(k, v) for k, v in start["headers"] if k != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                vary = [v for k, v in headers if k == b"vary"]
+                if not any(b"accept-encoding" in v.lower() for v in vary):
+                    headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    compressed = compressor.finish(body)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            chunk = compressor.chunk(body) if more_body else compressor.finish(body)
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+from .config import settings
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Each migration runs once, in order; the highest applied version is recorded in
+# the schema_migrations collection. Index builds are idempotent, so re-running a
+# migration after a partial failure is safe.
+
+
+async def _create_user_indexes(database):
+    await database.users.create_index([("username", ASCENDING)], unique=True, name="username_unique")
+    await database.users.create_index([("email", ASCENDING)], unique=True, name="email_unique")
+
+
+async def _create_expense_indexes(database):
+    # Keyset pagination over a user's expenses in (date, _id) order
+    await database.expenses.create_index(
+        [("user_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)],
+        name="user_date_id"
+    )
+    # Category-filtered lists and summaries
+    await database.expenses.create_index(
+        [("user_id", ASCENDING), ("category", ASCENDING), ("date", ASCENDING)],
+        name="user_category_date"
+    )
+
+
+async def _create_rollup_indexes(database):
+    # One rollup document per user, period and bucket start
+    await database.expense_rollups.create_index(
+        [("user_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)],
+        unique=True,
+        name="user_period_start"
+    )
+
+
+async def _create_refresh_token_indexes(database):
+    # Expired refresh tokens are removed by MongoDB itself
+    await database.refresh_tokens.create_index(
+        [("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"
+    )
+    await database.refresh_tokens.create_index([("family", ASCENDING)], name="family")
+    await database.refresh_tokens.create_index([("user_id", ASCENDING)], name="user_id")
+
+
+async def _add_sync_sequence(database):
+    # Expenses written before delta sync existed sort first, at seq 0
+    await database.expenses.update_many({"seq": {"$exists": False}}, {"$set": {"seq": 0}})
+    await database.expenses.create_index(
+        [("user_id", ASCENDING), ("seq", ASCENDING), ("_id", ASCENDING)],
+        name="user_seq_id"
+    )
+    await database.expense_tombstones.create_index(
+        [("user_id", ASCENDING), ("seq", ASCENDING), ("_id", ASCENDING)],
+        name="user_seq_id"
+    )
+    await database.expense_tombstones.create_index(
+        [("deleted_at", ASCENDING)],
+        expireAfterSeconds=settings.SYNC_TOMBSTONE_RETENTION_DAYS * 86400,
+        name="deleted_at_ttl"
+    )
+
+
+async def _create_job_indexes(database):
+    # Claiming looks for the oldest pending job or a running one with a stale heartbeat
+    await database.jobs.create_index(
+        [("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"
+    )
+    # Finished jobs are kept for a while so their status can still be read
+    await database.jobs.create_index(
+        [("finished_at", ASCENDING)],
+        expireAfterSeconds=settings.JOB_RETENTION_DAYS * 86400,
+        name="finished_at_ttl"
+    )
+
+
+async def _create_search_indexes(database):
+    # Full-text search within one user's expenses; the user_id prefix keeps every
+    # search scoped to a single user's index entries
+    await database.expenses.create_index(
+        [("user_id", ASCENDING), ("description", TEXT)], name="user_description_text"
+    )
+    await database.description_suggestions.create_index(
+        [("user_id", ASCENDING), ("text", ASCENDING)], unique=True, name="user_text"
+    )
+    await database.description_suggestions.create_index(
+        [("user_id", ASCENDING), ("count", DESCENDING)], name="user_count"
+    )
+
+
+async def _add_currencies(database):
+    # Amounts written before currencies existed are in the default currency
+    default = {"$set": {"currency": settings.DEFAULT_CURRENCY}}
+    await database.expenses.update_many({"currency": {"$exists": False}}, default)
+    await database.expense_rollups.update_many({"currency": {"$exists": False}}, default)
+    # Rollup buckets are now per currency
+    await database.expense_rollups.create_index(
+        [("user_id", ASCENDING), ("period", ASCENDING), ("start", ASCENDING), ("currency", ASCENDING)],
+        unique=True,
+        name="user_period_start_currency"
+    )
+    if "user_period_start" in await database.expense_rollups.index_information():
+        await database.expense_rollups.drop_index("user_period_start")
+    await database.fx_rates.create_index(
+        [("currency", ASCENDING), ("date", ASCENDING)], unique=True, name="currency_date"
+    )
+    # Lets the rate refresher check for changes without reading the table
+    await database.fx_rates.create_index([("updated_at", DESCENDING)], name="updated_at")
+
+
+async def _create_token_revocation_indexes(database):
+    # A revocation is dropped once every token issued before it has expired
+    await database.token_revocations.create_index(
+        [("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"
+    )
+
+
+async def _split_sync_sequence(database):
+    # seq used to be the data version itself; the sequence and its watermark carry on
+    # from it, so new seqs sort after every existing one
+    async for doc in database.data_versions.find({"seq": {"$exists": False}}, {"version": 1}):
+        version = doc.get("version", 0)
+        await database.data_versions.update_one(
+            {"_id": doc["_id"], "seq": {"$exists": False}},
+            {"$set": {"seq": version, "committed": version, "pending": []}}
+        )
+
+
+async def _create_user_id_indexes(database):
+    # Background user deletion pages through a user's documents in _id order; without
+    # these, each batch sorts or scans everything the user has left
+    for collection in ("expenses", "expense_rollups", "expense_tombstones", "description_suggestions"):
+        await database[collection].create_index(
+            [("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"
+        )
+
+
+MIGRATIONS = [
+    (1, "user unique indexes", _create_user_indexes),
+    (2, "expense compound indexes", _create_expense_indexes),
+    (3, "expense rollup index", _create_rollup_indexes),
+    (4, "refresh token indexes", _create_refresh_token_indexes),
+    (5, "delta sync sequence and tombstones", _add_sync_sequence),
+    (6, "background job indexes", _create_job_indexes),
+    (7, "expense search and suggestion indexes", _create_search_indexes),
+    (8, "expense currencies and exchange rates", _add_currencies),
+    (9, "token revocation index", _create_token_revocation_indexes),
+    (10, "sync sequence watermark", _split_sync_sequence),
+    (11, "per-user _id indexes for background deletion", _create_user_id_indexes),
+]
+
+
+async def current_version(database=db) -> int:
+    doc = await database.schema_migrations.find_one(sort=[("_id", DESCENDING)])
+    return doc["_id"] if doc else 0
+
+
+async def run_migrations(database=db) -> int:
+    applied = await current_version(database)
+    for version, name, migrate in MIGRATIONS:
+        if version <= applied:
+            continue
+        logger.info(f"Applying migration {version}: {name}")
+        await migrate(database)
+        # Keyed by version so workers starting together record each migration once
+        await database.schema_migrations.update_one(
+            {"_id": version},
+            {"$setOnInsert": {"name": name, "applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+        applied = version
+    return applied
+
+
+# Queries that run on hot paths; `explain` reports which index each one is planned on
+HOT_QUERIES = [
+    ("get_current_user", "users", {"username": "example"}, None),
+    ("create_user", "users", {"email": "example@example.com"}, None),
+    ("get_expenses", "expenses", {"user_id": "example"}, [("date", 1), ("_id", 1)]),
+    ("get_expenses?category", "expenses", {"user_id": "example", "category": "food"}, [("date", 1)]),
+    ("get_expense_changes", "expenses", {"user_id": "example", "seq": {"$gt": 0}}, [("seq", 1), ("_id", 1)]),
+    ("expense_rollups", "expense_rollups", {"user_id": "example", "period": "day"}, [("start", 1)]),
+    ("delete_user batch", "expenses", {"user_id": "example"}, [("_id", 1)]),
+]
+
+
+def _winning_indexes(plan: dict) -> list:
+    # Walk the winning plan and collect every index it scans
+    names = []
+    stack = [plan]
+    while stack:
+        stage = stack.pop()
+        if "indexName" in stage:
+            names.append(stage["indexName"])
+        if stage.get("stage") == "COLLSCAN":
+            names.append("COLLSCAN")
+        stack.extend(stage.get("inputStages", []))
+        if "inputStage" in stage:
+            stack.append(stage["inputStage"])
+        if "queryPlan" in stage:
+            stack.append(stage["queryPlan"])
+    return names
+
+
+async def explain_hot_queries(database=db) -> list:
+    report = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        planner = explain.get("queryPlanner", {})
+        report.append({
+            "query": name,
+            "collection": collection,
+            "indexes": _winning_indexes(planner.get("winningPlan", {})),
+        })
+    return report
+
+
+async def _main(command: str):
+    if command == "migrate":
+        version = await run_migrations()
+        print(f"Schema is at version {version}")
+    elif command == "status":
+        print(f"Schema is at version {await current_version()} of {MIGRATIONS[-1][0]}")
+    elif command == "explain":
+        print(json.dumps(await explain_hot_queries(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database index migrations and diagnostics")
+    parser.add_argument("command", choices=["migrate", "status", "explain"])
+    args = parser.parse_args()
+    asyncio.run(_main(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from .config import settings
+
+# Production entry point:
+#
+#     python -m app.core.server --workers 4
+#
+# The supervisor binds the socket once and runs one uvicorn server per worker
+# process on it. uvloop and httptools are used when installed. Each worker warms
+# up (database pool, indexes, hashing pool) before /readyz reports it ready. On
+# SIGTERM a worker first reports draining on /readyz for SERVER_DRAIN_DELAY_SECONDS
+# so the load balancer stops sending it traffic, then stops accepting connections
+# and waits up to SERVER_GRACEFUL_TIMEOUT_SECONDS for in-flight requests.
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingServer(uvicorn.Server):
+    def __init__(self, config, drain_delay: float):
+        super().__init__(config)
+        self.drain_delay = drain_delay
+        self._drain_timer = None
+
+    def handle_exit(self, sig, frame):
+        # A second signal, or no delay configured, falls through to uvicorn's handling
+        if self._drain_timer is not None or self.drain_delay <= 0:
+            super().handle_exit(sig, frame)
+            return
+        # Imported here so the supervisor process never loads the app and its database client
+        from .health import readiness
+        readiness.mark_draining()
+        self._drain_timer = threading.Timer(self.drain_delay, super().handle_exit, (sig, frame))
+        self._drain_timer.daemon = True
+        self._drain_timer.start()
+
+
+def _implementations() -> dict:
+    # "auto" already prefers these; resolved here so the choice is logged once
+    return {
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+    }
+
+
+def _config(args, **extra) -> uvicorn.Config:
+    return uvicorn.Config(
+        args.app,
+        host=args.host,
+        port=args.port,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        **_implementations(),
+        **extra
+    )
+
+
+def _serve_worker(args, sockets):
+    # Runs in a spawned worker process
+    DrainingServer(_config(args), args.drain_delay).run(sockets=sockets)
+
+
+class Supervisor:
+    # Keeps `workers` processes serving the shared socket and restarts any that die
+    def __init__(self, args):
+        self.args = args
+        self.processes = []
+        self.should_exit = threading.Event()
+        self.context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, sock):
+        process = self.context.Process(target=_serve_worker, args=(self.args, [sock]))
+        process.start()
+        return process
+
+    def _handle_exit(self, sig, frame):
+        self.should_exit.set()
+
+    def run(self):
+        sock = _config(self.args).bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._handle_exit)
+
+        self.processes = [self._spawn(sock) for _ in range(self.args.workers)]
+        logger.info(f"Started {len(self.processes)} workers on {self.args.host}:{self.args.port}")
+
+        exit_code = 0
+        while not self.should_exit.wait(0.5):
+            for index, process in enumerate(self.processes):
+                if process.is_alive():
+                    continue
+                if process.exitcode == STARTUP_FAILURE:
+                    # Warm-up failed (e.g. no database); restarting would only fail again
+                    logger.error(f"Worker {process.pid} failed to start, shutting down")
+                    exit_code = 1
+                    self.should_exit.set()
+                    break
+                logger.warning(f"Worker {process.pid} exited with code {process.exitcode}, restarting")
+                self.processes[index] = self._spawn(sock)
+
+        self.shutdown()
+        sock.close()
+        return exit_code
+
+    def shutdown(self):
+        for process in self.processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        # Each worker drains, then waits out in-flight requests; allow both plus a margin
+        deadline = time.monotonic() + self.args.drain_delay + self.args.graceful_timeout + 5
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ChillBills API")
+    parser.add_argument("--app", default="main:app", help="ASGI application, as module:attribute")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS or os.cpu_count() or 1,
+        help="Worker processes (default SERVER_WORKERS, or one per CPU)"
+    )
+    parser.add_argument("--drain-delay", type=float, default=settings.SERVER_DRAIN_DELAY_SECONDS)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    args = parser.parse_args()
+    # Workers read the resolved count (e.g. the event stream checks it)
+    os.environ["SERVER_WORKERS"] = str(args.workers)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    implementations = _implementations()
+    logger.info(f"Event loop: {implementations['loop']}, HTTP parser: {implementations['http']}")
+
+    if args.workers <= 1:
+        server = DrainingServer(_config(args), args.drain_delay)
+        server.run()
+        if not server.started:
+            sys.exit(STARTUP_FAILURE)
+    else:
+        sys.exit(Supervisor(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional
 from datetime import datetime
 from enum import Enum
@@ -18,8 +18,11 @@ class ExpenseBase(BaseModel):
     description: str = ""
     category: ExpenseCategory = ExpenseCategory.other
     date: datetime
+    # ISO 4217 code; the default currency when omitted on create, unchanged on update
+    currency: Optional[str] = Field(None, min_length=3, max_length=3)
 
-    @validator('date')
+    @field_validator('date', mode='before')
+    @classmethod
     def validate_date(cls, v):
         if isinstance(v, str):
             try:
@@ -41,8 +44,57 @@ class Expense(ExpenseBase):
     id: str
     user_id: str
 
-    class Config:
-        allow_population_by_field_name = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    model_config = ConfigDict(populate_by_name=True)
+
+class ExpenseSearchResult(Expense):
+    score: float
+
+
+class DescriptionSuggestion(BaseModel):
+    description: str
+    count: int
+
+
+class ExpenseChanges(BaseModel):
+    updated: list[Expense]
+    deleted: list[str]
+    next_token: str
+    has_more: bool
+    # True when the client must drop its local copy and rebuild from this response
+    reset: bool
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+class SummaryGroupBy(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+    category = "category"
+
+class ExpenseSummaryRow(BaseModel):
+    key: str
+    total: float
+    count: int
+    average: float
+
+class ExpenseSummary(BaseModel):
+    group_by: SummaryGroupBy
+    currency: str
+    total: float
+    count: int
+    rows: list[ExpenseSummaryRow]
+
+class BulkImportError(BaseModel):
+    index: int
+    detail: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[BulkImportError]
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+from datetime import datetime
+
+class JobStepProgress(BaseModel):
+    deleted: int = 0
+    total: Optional[int] = None
+    done: bool = False
+
+class JobStatus(BaseModel):
+    id: str
+    type: str
+    status: str  # pending, running, completed or failed
+    progress: Dict[str, JobStepProgress] = {}
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 import re
+from typing import Optional
 
 class User(BaseModel):
     username: str = Field(
@@ -16,6 +17,12 @@ class User(BaseModel):
         max_length=100,
         description="Password must be at least 6 characters long"
     )
+    base_currency: Optional[str] = Field(
+        None,
+        min_length=3,
+        max_length=3,
+        description="ISO 4217 code that summaries and insights are reported in"
+    )
     model_config = ConfigDict(
         from_attributes=True,
         extra='forbid',  
@@ -39,6 +46,10 @@ class User(BaseModel):
 class UserProfileResponse(BaseModel):
     username: str
     email: str
+    base_currency: Optional[str] = None
+
+class BaseCurrencyUpdate(BaseModel):
+    base_currency: str = Field(..., min_length=3, max_length=3)
 
 class LoginResponse(BaseModel):
     access_token: str
@@ -46,6 +57,15 @@ class LoginResponse(BaseModel):
     user_id: str
     username: str
     email: str
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class TokenRefreshResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
 
 class ClearUsersRequest(BaseModel):
     confirmation: str
@@ -0,0 +1,247 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.database import db
+from . import fx
+from .expense_filters import build_expense_filter
+
+logger = logging.getLogger(__name__)
+
+# Advanced insights: rolling 7/30-day windows, per-category month-over-month change,
+# a spend forecast and z-score anomaly flags.
+#
+# MongoDB groups the user's expenses by (day, category, currency) so only a few
+# thousand rows leave the database however many expenses there are. Those rows are
+# loaded once into columnar arrays, converted into the user's base currency in one
+# pass, and scattered into a dense day x category matrix covering
+# the last ANALYTICS_LOOKBACK_DAYS days; every metric is then a cumulative sum, a
+# difference of cumulative sums (sliding windows) or a masked reduction over it.
+
+ROLLING_WINDOWS = (7, 30)
+ANOMALY_WINDOW = 30  # days before each day that its z-score is measured against
+ANOMALY_MIN_HISTORY = 7  # days of history needed before a day can be flagged
+FORECAST_MONTHS = 6  # complete months fitted by the next-month trend
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class DailyColumns:
+    # One entry per (day, category) with spending: day as datetime64[D], category as
+    # an index into `category_names`, and the day's total and expense count
+    def __init__(self, days, categories, totals, counts, category_names):
+        self.days = days
+        self.categories = categories
+        self.totals = totals
+        self.counts = counts
+        self.category_names = category_names
+
+    @classmethod
+    def from_rows(cls, rows: list, currency: Optional[str] = None) -> "DailyColumns":
+        # Totals are converted into `currency` when given; otherwise rows are assumed
+        # to share one currency
+        if not rows:
+            return cls(
+                np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.int64),
+                np.empty(0), np.empty(0, dtype=np.int64), []
+            )
+        codes = {}
+        count = len(rows)
+        days = np.fromiter((row["day"].toordinal() for row in rows), dtype=np.int64, count=count) - EPOCH_ORDINAL
+        totals = np.fromiter((row["total"] for row in rows), dtype=np.float64, count=count)
+        if currency is not None:
+            totals = fx.convert(totals, [row.get("currency") for row in rows], days, currency)
+        return cls(
+            days.astype("datetime64[D]"),
+            np.fromiter(
+                (codes.setdefault(row["category"] or "other", len(codes)) for row in rows),
+                dtype=np.int64, count=count
+            ),
+            totals,
+            np.fromiter((row["count"] for row in rows), dtype=np.int64, count=count),
+            list(codes),
+        )
+
+
+def build_daily_category_pipeline(user_id: str, start: datetime) -> list:
+    return [
+        {"$match": build_expense_filter(user_id, start)},
+        {"$group": {
+            "_id": {
+                "day": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                "category": "$category",
+                "currency": {"$ifNull": ["$currency", settings.DEFAULT_CURRENCY]},
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "day": "$_id.day", "category": "$_id.category", "currency": "$_id.currency",
+            "total": 1, "count": 1,
+        }},
+    ]
+
+
+async def load_columns(
+    user_id: str, start: datetime, currency: Optional[str] = None, database=db, session=None
+) -> DailyColumns:
+    pipeline = build_daily_category_pipeline(user_id, start)
+    rows = await database.expenses.aggregate(pipeline, session=session).to_list(length=None)
+    return DailyColumns.from_rows(rows, currency or settings.DEFAULT_CURRENCY)
+
+
+def _window_sums(cumulative: np.ndarray, width: int) -> np.ndarray:
+    # cumulative has a leading 0; returns the sum of the `width` values ending at each index
+    ends = np.arange(1, len(cumulative))
+    return cumulative[ends] - cumulative[np.maximum(ends - width, 0)]
+
+
+def _rounded(values: np.ndarray) -> list:
+    return np.round(values, 2).tolist()
+
+
+def compute_analytics(
+    columns: DailyColumns,
+    today: date,
+    lookback_days: Optional[int] = None,
+    series_days: Optional[int] = None,
+    z_threshold: Optional[float] = None,
+) -> dict:
+    lookback_days = lookback_days or settings.ANALYTICS_LOOKBACK_DAYS
+    series_days = min(series_days or settings.ANALYTICS_SERIES_DAYS, lookback_days)
+    z_threshold = z_threshold or settings.ANALYTICS_ZSCORE_THRESHOLD
+    n = lookback_days
+    n_categories = len(columns.category_names)
+
+    # Dense day x category matrix over [start, today]; later-dated expenses are ignored
+    start = np.datetime64(today, "D") - (n - 1)
+    index = (columns.days - start).astype(np.int64)
+    keep = (index >= 0) & (index < n)
+    index, codes, totals = index[keep], columns.categories[keep], columns.totals[keep]
+    by_category = np.bincount(
+        index * n_categories + codes, weights=totals, minlength=n * n_categories
+    ).reshape(n, n_categories)
+    daily = by_category.sum(axis=1)
+    counts = np.bincount(index, weights=columns.counts[keep], minlength=n).astype(np.int64)
+
+    # Days before the user's first expense in the window don't dilute the averages
+    spent = np.flatnonzero(counts)
+    first = int(spent[0]) if spent.size else n - 1
+    history = np.maximum(np.arange(1, n + 1) - first, 1)
+
+    cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+    rolling = {width: _window_sums(cumulative, width) / np.minimum(history, width) for width in ROLLING_WINDOWS}
+
+    # z-score of each day against the ANOMALY_WINDOW days before it
+    squares = np.concatenate(([0.0], np.cumsum(daily * daily)))
+    prior = np.minimum(history - 1, ANOMALY_WINDOW)
+    window_sum = np.concatenate(([0.0], _window_sums(cumulative, ANOMALY_WINDOW)[:-1]))
+    window_squares = np.concatenate(([0.0], _window_sums(squares, ANOMALY_WINDOW)[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.where(prior > 0, window_sum / prior, 0.0)
+        variance = np.where(prior > 0, window_squares / prior - expected * expected, 0.0)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        z_scores = np.where((std > 1e-9) & (prior >= ANOMALY_MIN_HISTORY), (daily - expected) / std, 0.0)
+    anomalous = np.abs(z_scores) >= z_threshold
+
+    # Calendar months of each day in the window
+    dates = start + np.arange(n)
+    months = dates.astype("datetime64[M]")
+    day_of_month = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+    current_month = np.datetime64(today, "M")
+    in_current = months == current_month
+    in_previous = months == current_month - 1
+    previous_to_date = in_previous & (day_of_month <= today.day)
+
+    # Month-over-month by category: month to date against the same days of last month
+    current_totals = by_category[in_current].sum(axis=0)
+    previous_totals = by_category[in_previous].sum(axis=0)
+    previous_to_date_totals = by_category[previous_to_date].sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(
+            previous_to_date_totals > 0,
+            (current_totals - previous_to_date_totals) / previous_to_date_totals * 100,
+            np.nan
+        )
+    order = np.argsort(-current_totals, kind="stable")
+    order = order[(current_totals[order] > 0) | (previous_totals[order] > 0)]
+    categories = [
+        {
+            "category": columns.category_names[i],
+            "current_month": round(float(current_totals[i]), 2),
+            "previous_month": round(float(previous_totals[i]), 2),
+            "previous_month_to_date": round(float(previous_to_date_totals[i]), 2),
+            "change_percentage": None if np.isnan(change[i]) else round(float(change[i]), 2),
+        }
+        for i in order
+    ]
+
+    # Forecast: the rest of this month at the trailing 30-day daily rate, and next
+    # month from a linear trend over the last complete months
+    month_to_date = float(daily[in_current].sum())
+    month_days = (current_month + 1).astype("datetime64[D]") - current_month.astype("datetime64[D]")
+    days_in_month = int(month_days.astype(np.int64))
+    daily_rate = float(rolling[30][-1])
+    month_index = (months - months[0]).astype(np.int64)
+    monthly = np.bincount(month_index, weights=daily)
+    # Only months wholly inside the window and after the first expense count as complete
+    first_complete = int(month_index[first]) + (1 if day_of_month[first] > 1 else 0)
+    complete = monthly[first_complete:int(month_index[-1])][-FORECAST_MONTHS:]
+    if complete.size >= 2:
+        slope, intercept = np.polyfit(np.arange(complete.size), complete, 1)
+        # Next month is two steps past the last complete one
+        next_month_total = max(0.0, float(intercept + slope * (complete.size + 1)))
+    elif complete.size == 1:
+        next_month_total = float(complete[0])
+    else:
+        next_month_total = None
+
+    series = slice(n - series_days, n)
+    anomalies = np.flatnonzero(anomalous[series]) + (n - series_days)
+    return {
+        "as_of": today.isoformat(),
+        "rolling": {
+            f"last_{width}_days": {
+                "total": round(float(daily[-width:].sum()), 2),
+                "daily_average": round(float(rolling[width][-1]), 2),
+            }
+            for width in ROLLING_WINDOWS
+        },
+        "categories": categories,
+        "forecast": {
+            "month_to_date": round(month_to_date, 2),
+            "projected_month_total": round(month_to_date + daily_rate * (days_in_month - today.day), 2),
+            "next_month_total": None if next_month_total is None else round(next_month_total, 2),
+            "months_fitted": int(complete.size),
+        },
+        "anomalies": [
+            {
+                "date": str(dates[i]),
+                "amount": round(float(daily[i]), 2),
+                "expected": round(float(expected[i]), 2),
+                "z_score": round(float(z_scores[i]), 2),
+            }
+            for i in anomalies
+        ],
+        "daily": [
+            {
+                "date": day, "total": total, "count": count,
+                "rolling_7": r7, "rolling_30": r30, "z_score": z, "anomaly": flag,
+            }
+            for day, total, count, r7, r30, z, flag in zip(
+                dates[series].astype(str).tolist(), _rounded(daily[series]), counts[series].tolist(),
+                _rounded(rolling[7][series]), _rounded(rolling[30][series]), _rounded(z_scores[series]),
+                anomalous[series].tolist()
+            )
+        ],
+    }
+
+
+async def get_advanced_insights(user_id: str, currency: Optional[str] = None, database=db, session=None) -> dict:
+    today = datetime.now().date()
+    currency = currency or settings.DEFAULT_CURRENCY
+    start = datetime.combine(today - timedelta(days=settings.ANALYTICS_LOOKBACK_DAYS - 1), datetime.min.time())
+    columns = await load_columns(user_id, start, currency, database=database, session=session)
+    return {"currency": currency, **compute_analytics(columns, today)}
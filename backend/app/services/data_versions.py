@@ -0,0 +1,130 @@
+import time
+from contextlib import asynccontextmanager
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from ..core.config import settings
+from ..core.database import db, read_db
+from ..utils.cache import TTLCache
+
+# One document per user in data_versions:
+#   version    bumped once a write has finished (expense, rollups and all), so an
+#              ETag is never handed out for data that a later read could still change
+#   seq        change sequence numbers, handed to writes before they start (see sync)
+#   committed  every seq up to this one belongs to a finished write
+#   pending    reservations still in flight, in seq order: {"id", "n", "at"}
+#
+# Writes can finish out of order, so delta sync never reads past `committed`: a
+# token beyond a still-running write would skip it for good. A reservation older
+# than SYNC_RESERVATION_TIMEOUT_SECONDS is taken to belong to a crashed worker and
+# no longer holds `committed` back.
+#
+# Version reads consult a short-lived local cache; bumps made by this process update
+# it immediately, while bumps made by other workers become visible once the cached
+# entry expires.
+_versions = TTLCache(
+    maxsize=settings.DATA_VERSION_CACHE_SIZE,
+    ttl=settings.DATA_VERSION_CACHE_TTL_SECONDS
+)
+
+
+async def get_version(user_id: str, session=None) -> int:
+    if session is not None:
+        # Routed reads go uncached through the session, so the version is never
+        # newer than the data read after it (see database.read_session)
+        doc = await read_db.data_versions.find_one({"_id": user_id}, {"version": 1}, session=session)
+        return doc.get("version", 0) if doc else 0
+    version = _versions.get(user_id)
+    if version is None:
+        doc = await db.data_versions.find_one({"_id": user_id}, {"version": 1})
+        version = doc.get("version", 0) if doc else 0
+        _versions.set(user_id, version)
+    return version
+
+
+async def bump_version(user_id: str, by: int = 1) -> int:
+    # For changes that are finished by the time this runs
+    doc = await db.data_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"version": by}},
+        projection={"version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _versions.set(user_id, doc["version"])
+    return doc["version"]
+
+
+def _advance(committed: int, pending: list) -> tuple:
+    # Pops finished and abandoned reservations off the front of `pending`
+    stale_before = time.time() - settings.SYNC_RESERVATION_TIMEOUT_SECONDS
+    pending = list(pending)
+    while pending and (pending[0].get("done") or pending[0]["at"] < stale_before):
+        committed += pending.pop(0)["n"]
+    return committed, pending
+
+
+async def _finish(user_id: str, reservation: dict, last_seq: int):
+    # Usually the only write in flight: one update retires it
+    doc = await db.data_versions.find_one_and_update(
+        {"_id": user_id, "pending": [reservation]},
+        {"$set": {"pending": [], "committed": last_seq}, "$inc": {"version": 1}},
+        projection={"version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    while doc is None:
+        # Others are in flight too: mark this one done and advance past whatever
+        # finished in front of it, retrying if the list changes underneath
+        current = await db.data_versions.find_one({"_id": user_id}, {"committed": 1, "pending": 1})
+        if current is None:
+            # The user was deleted meanwhile
+            return
+        pending = [
+            dict(entry, done=True) if entry["id"] == reservation["id"] else entry
+            for entry in current.get("pending", [])
+        ]
+        committed, pending = _advance(current.get("committed", 0), pending)
+        doc = await db.data_versions.find_one_and_update(
+            {"_id": user_id, "pending": current.get("pending", [])},
+            {"$set": {"pending": pending, "committed": committed}, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    _versions.set(user_id, doc["version"])
+
+
+@asynccontextmanager
+async def reserve_seq(user_id: str, count: int = 1):
+    # Yields the first of `count` consecutive seqs for a write made inside the block.
+    # Leaving the block, even by an error, finishes the write and bumps the version.
+    reservation = {"id": ObjectId(), "n": count, "at": int(time.time())}
+    doc = await db.data_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"seq": count}, "$push": {"pending": reservation}},
+        projection={"seq": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    try:
+        yield doc["seq"] - count + 1
+    finally:
+        await _finish(user_id, reservation, doc["seq"])
+
+
+async def get_sync_watermark(user_id: str) -> int:
+    # Highest seq that delta sync may hand out a token for
+    doc = await db.data_versions.find_one({"_id": user_id}, {"committed": 1, "pending": 1})
+    if doc is None:
+        return 0
+    committed, _ = _advance(doc.get("committed", 0), doc.get("pending", []))
+    return committed
+
+
+async def delete_user_version(user_id: str):
+    await db.data_versions.delete_one({"_id": user_id})
+    _versions.invalidate(user_id)
+
+
+def cache_stats() -> dict:
+    return _versions.stats()
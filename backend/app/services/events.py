@@ -0,0 +1,371 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from typing import AsyncIterator, Iterable, Optional
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..core.config import settings
+from ..core.database import db
+from ..core.health import readiness
+from ..utils.serialization import dumps, expense_to_dict
+from . import data_versions, sync
+
+logger = logging.getLogger(__name__)
+
+# Server-sent events of expense changes, for GET /expenses/stream.
+#
+# Each connection is a Subscription: a byte-capped queue of encoded events and a
+# wake-up flag, with no task of its own. Events are encoded once per change and
+# shared by all of a user's connections. Publishing never waits on a client: when
+# a connection's queue would exceed STREAM_MAX_BUFFER_BYTES it is emptied and the
+# client is sent a `reset` event telling it to resync through /expenses/changes.
+#
+# Changes come from a MongoDB change stream on expenses and expense_tombstones
+# when the deployment supports one (a replica set), so every worker sees writes
+# made through any worker. Otherwise the write endpoints publish to this worker's
+# subscribers directly, which covers single-worker and test setups; with several
+# workers a stream would miss other workers' writes, so that is refused when forced
+# with STREAM_SOURCE=local and logged as a warning when it is the fallback.
+#
+# Only `synced` events carry an id, and it is a sync token (see sync), so a client
+# reconnecting with Last-Event-ID first receives what it missed. Change events have
+# no id of their own: their seq can be ahead of the sync watermark while an earlier
+# write is still running, and resuming from there would skip that write. A live
+# stream that delivered changes sends a `synced` checkpoint every
+# STREAM_HEARTBEAT_SECONDS, at the watermark read one interval earlier, so the
+# change stream has had that long to deliver everything the checkpoint covers.
+# Changes after a checkpoint may be sent again after a reconnect.
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+MIN_OBJECT_ID = ObjectId(b"\x00" * 12)
+
+LOCAL = "local"
+CHANGE_STREAM = "change_stream"
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> bytes:
+    message = b"event: " + event.encode() + b"\n"
+    if event_id:
+        message += b"id: " + event_id.encode() + b"\n"
+    return message + b"data: " + dumps(data) + b"\n\n"
+
+
+def expense_event(kind: str, doc: dict) -> tuple:
+    # (sort key, encoded event) for a created or updated expense document
+    key = (doc.get("seq", 0), doc["_id"])
+    data = {"type": kind, "seq": key[0], "expense": expense_to_dict(doc)}
+    return key, format_event("expense", data)
+
+
+def deletion_event(expense_id: ObjectId, seq: int) -> tuple:
+    key = (seq, expense_id)
+    data = {"type": DELETED, "seq": seq, "id": str(expense_id)}
+    return key, format_event("expense", data)
+
+
+class Subscription:
+    __slots__ = ("user_id", "queue", "size", "reset_reason", "closed", "_wake")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.queue = deque()
+        self.size = 0
+        self.reset_reason = None
+        self.closed = False
+        self._wake = asyncio.Event()
+
+    def push(self, key: tuple, message: bytes) -> bool:
+        # Returns False when the message was dropped
+        if self.reset_reason is not None:
+            return False
+        if self.size + len(message) > settings.STREAM_MAX_BUFFER_BYTES:
+            self.reset("overflow")
+            return False
+        self.queue.append((key, message))
+        self.size += len(message)
+        self._wake.set()
+        return True
+
+    def reset(self, reason: str):
+        # Queued events are dropped; the client is told to resync instead
+        self.queue.clear()
+        self.size = 0
+        self.reset_reason = reason
+        self._wake.set()
+
+    def close(self):
+        self.closed = True
+        self._wake.set()
+
+    async def wait(self, timeout: float) -> bool:
+        # True if there is something to send (or the subscription closed)
+        if not self.queue and self.reset_reason is None and not self.closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        self._wake.clear()
+        return True
+
+    def drain(self) -> list:
+        messages = list(self.queue)
+        self.queue.clear()
+        self.size = 0
+        return messages
+
+
+class EventHub:
+    def __init__(self):
+        self.mode = LOCAL
+        self._subscribers = {}
+        self.connections = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        # Checks the limits and takes the slot in one step, with no await in between,
+        # so concurrent connects can't all pass the check
+        subscribers = self._subscribers.get(user_id, ())
+        if self.connections >= settings.STREAM_MAX_CONNECTIONS:
+            raise TooManyStreams("Too many open event streams on this server")
+        if len(subscribers) >= settings.STREAM_MAX_CONNECTIONS_PER_USER:
+            raise TooManyStreams("Too many open event streams for this user")
+        subscription = Subscription(user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: str, events: Iterable[tuple]):
+        subscribers = self._subscribers.get(user_id)
+        if not subscribers:
+            return
+        for key, message in events:
+            self.published += 1
+            for subscription in subscribers:
+                if not subscription.push(key, message):
+                    self.dropped += 1
+
+    def reset_all(self):
+        # Events may have been missed: every client resyncs
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.reset("resync")
+
+    def close(self):
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.close()
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "connections": self.connections,
+            "users": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+event_hub = EventHub()
+
+
+# Called by the write endpoints. With a change stream running, it delivers the same
+# changes to every worker, so local publishing would only duplicate them.
+
+def publish_expenses(user_id: str, kind: str, docs: Iterable[dict]):
+    if event_hub.mode == LOCAL and event_hub.has_subscribers(user_id):
+        event_hub.publish(user_id, (expense_event(kind, doc) for doc in docs))
+
+
+def publish_deletion(user_id: str, expense_id: ObjectId, seq: int):
+    if event_hub.mode == LOCAL and event_hub.has_subscribers(user_id):
+        event_hub.publish(user_id, [deletion_event(expense_id, seq)])
+
+
+class ChangeStreamWatcher:
+    # Feeds event_hub from one change stream per worker
+    PIPELINE = [{"$match": {"$or": [
+        {"ns.coll": "expenses", "operationType": {"$in": ["insert", "update", "replace"]}},
+        {"ns.coll": "expense_tombstones", "operationType": "insert"},
+    ]}}]
+
+    def __init__(self):
+        self._task = None
+        self.errors = 0
+
+    async def _open(self, database):
+        stream = database.watch(self.PIPELINE, full_document="updateLookup")
+        # Entering runs the aggregate, so an unsupported deployment fails here
+        await stream.__aenter__()
+        return stream
+
+    async def start(self, database=db):
+        if settings.STREAM_SOURCE == LOCAL:
+            if settings.SERVER_WORKERS > 1:
+                raise RuntimeError(
+                    "STREAM_SOURCE=local needs a single worker: streams would miss writes made "
+                    "through the other workers"
+                )
+            return
+        try:
+            stream = await self._open(database)
+        except OperationFailure as e:
+            # Standalone servers have no change streams
+            if settings.STREAM_SOURCE == CHANGE_STREAM:
+                raise
+            if settings.SERVER_WORKERS > 1:
+                logger.warning(
+                    f"Change streams unavailable ({str(e)}); expense events are published locally, so "
+                    f"with {settings.SERVER_WORKERS} workers a stream only sees writes made through its "
+                    "own worker. Use a replica set, or run one worker."
+                )
+            else:
+                logger.info(f"Change streams unavailable ({str(e)}); expense events are published locally")
+            return
+        event_hub.mode = CHANGE_STREAM
+        self._task = asyncio.create_task(self._run(database, stream))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, database, stream):
+        while True:
+            try:
+                async with stream:
+                    async for change in stream:
+                        self._dispatch(change)
+            except PyMongoError as e:
+                self.errors += 1
+                logger.error(f"Expense change stream failed: {str(e)}")
+            stream = None
+            while stream is None:
+                await asyncio.sleep(1)
+                try:
+                    stream = await self._open(database)
+                except PyMongoError as e:
+                    self.errors += 1
+                    logger.error(f"Could not reopen the expense change stream: {str(e)}")
+            # Changes made while no stream was open were missed; clients resync
+            event_hub.reset_all()
+
+    def _dispatch(self, change: dict):
+        doc = change.get("fullDocument")
+        if doc is None or "user_id" not in doc:
+            # Updated and then deleted before the lookup; the tombstone follows
+            return
+        if change["ns"]["coll"] == "expense_tombstones":
+            event = deletion_event(doc["_id"], doc.get("seq", 0))
+        else:
+            event = expense_event(CREATED if change["operationType"] == "insert" else UPDATED, doc)
+        event_hub.publish(doc["user_id"], [event])
+
+
+change_stream_watcher = ChangeStreamWatcher()
+
+
+async def _replay(user_id: str, last_event_id: str) -> tuple:
+    # Changes after the client's last event, as (events, last key); None if it must resync
+    try:
+        changes = await sync.get_changes(user_id, last_event_id, settings.STREAM_REPLAY_LIMIT)
+        state = sync.decode_token(changes["token"])
+    except sync.InvalidSyncToken:
+        return None
+    if changes["reset"] or changes["has_more"]:
+        return None
+    events = [expense_event(UPDATED, doc)[1] for doc in changes["updated"]]
+    events += [
+        format_event("expense", {"type": DELETED, "id": expense_id}) for expense_id in changes["deleted"]
+    ]
+    if events:
+        # The last event carries the position, so a later reconnect resumes after all of them
+        events.append(format_event("synced", {}, changes["token"]))
+    return events, (state["seq"], state["id"] or MIN_OBJECT_ID)
+
+
+def open_stream(user_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    # Takes the connection slot straight away (raising TooManyStreams when there is
+    # none) and subscribes before replaying, so nothing written in between is missed.
+    # The stream gives the slot back when it ends, or when it is discarded without
+    # ever being started, e.g. because the client went away first.
+    subscription = event_hub.subscribe(user_id)
+    stream = stream_events(subscription, last_event_id)
+    weakref.finalize(stream, event_hub.unsubscribe, subscription)
+    return stream
+
+
+async def stream_events(subscription: Subscription, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    user_id = subscription.user_id
+    try:
+        yield f"retry: {settings.STREAM_RETRY_MS}\n\n".encode()
+        after = None
+        if last_event_id:
+            replayed = await _replay(user_id, last_event_id)
+            if replayed is None:
+                yield format_event("reset", {"reason": "resync"})
+            else:
+                events, after = replayed
+                for message in events:
+                    yield message
+
+        checkpoint = None
+        delivered = False
+        checked_at = time.monotonic()
+        while not subscription.closed:
+            if not await subscription.wait(settings.STREAM_HEARTBEAT_SECONDS):
+                if readiness.draining:
+                    # The client reconnects to a worker that is staying up
+                    break
+                yield b": ping\n\n"
+            elif subscription.reset_reason is not None:
+                reason, subscription.reset_reason = subscription.reset_reason, None
+                # The dropped events are not covered by a checkpoint read before them
+                checkpoint = None
+                yield format_event("reset", {"reason": reason})
+            else:
+                messages = [
+                    message for key, message in subscription.drain()
+                    if after is None or key > after
+                ]
+                if messages:
+                    delivered = True
+                    yield b"".join(messages)
+
+            if time.monotonic() - checked_at >= settings.STREAM_HEARTBEAT_SECONDS:
+                checked_at = time.monotonic()
+                if checkpoint is not None:
+                    yield format_event("synced", {}, checkpoint)
+                checkpoint = None
+                if delivered:
+                    watermark = await data_versions.get_sync_watermark(user_id)
+                    checkpoint = sync.encode_token(watermark, None)
+                    delivered = False
+    finally:
+        event_hub.unsubscribe(subscription)
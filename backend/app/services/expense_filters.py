@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional, Sequence
+
+
+def build_expense_filter(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    categories: Optional[Sequence[str]] = None,
+) -> dict:
+    # Shared by every expense query that accepts a date range and category filter.
+    # `start` is inclusive and `end` is exclusive.
+    query = {"user_id": user_id}
+    if start is not None or end is not None:
+        query["date"] = {}
+        if start is not None:
+            query["date"]["$gte"] = start
+        if end is not None:
+            query["date"]["$lt"] = end
+    if categories:
+        values = [str(getattr(c, "value", c)).lower() for c in categories]
+        query["category"] = values[0] if len(values) == 1 else {"$in": values}
+    return query
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from ..core.config import settings
+
+EXPORT_FIELDS = ("id", "date", "amount", "currency", "category", "description")
+EXPORT_PROJECTION = {"_id": 1, "date": 1, "amount": 1, "currency": 1, "category": 1, "description": 1}
+
+
+def _row(doc: dict) -> tuple:
+    return (
+        str(doc["_id"]),
+        doc["date"].isoformat(),
+        doc.get("amount"),
+        doc.get("currency", settings.DEFAULT_CURRENCY),
+        doc.get("category"),
+        doc.get("description", ""),
+    )
+
+
+async def iter_csv(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    # Header goes out before the first batch arrives so clients see bytes immediately
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue().encode()
+
+    buffer.seek(0)
+    buffer.truncate()
+    pending = 0
+    async for doc in cursor:
+        writer.writerow(_row(doc))
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode()
+
+
+async def iter_ndjson(cursor, batch_size: int) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(dict(zip(EXPORT_FIELDS, _row(doc)))))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
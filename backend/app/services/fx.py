@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Optional, Sequence
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.database import db
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Foreign exchange rates. A rate is the number of units of a currency that one unit
+# of FX_REFERENCE_CURRENCY buys on a day, so converting from A to B on a day is
+# amount * rate(B) / rate(A). Rates are read from FX_RATES_FILE (CSV with
+# date,currency,rate columns) or, when that is unset, from the fx_rates collection,
+# into an in-memory table of sorted per-currency arrays. A day without a rate uses
+# the latest rate before it, or the earliest rate for days before the first one.
+#
+# The table is rebuilt in the background when its source changes, so new rates need
+# no restart. Each table memoises the conversion factor per (currency, target, day);
+# a rebuilt table starts with an empty memo.
+
+CURRENCY_PATTERN = re.compile(r"^[A-Z]{3}$")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class UnsupportedCurrency(ValueError):
+    pass
+
+
+def normalize_currency(currency: Optional[str]) -> str:
+    currency = str(currency or "").strip().upper()
+    if not CURRENCY_PATTERN.match(currency):
+        raise UnsupportedCurrency("Currency must be a three-letter ISO 4217 code")
+    return currency
+
+
+def day_ordinals(values) -> np.ndarray:
+    # Days since 1970-01-01 for a sequence of dates or datetimes; None (no day needed) gives 0
+    values = list(values)
+    return np.fromiter(
+        (value.toordinal() - EPOCH_ORDINAL if value is not None else 0 for value in values),
+        dtype=np.int64, count=len(values)
+    )
+
+
+class RateTable:
+    # Immutable once built; a refresh builds a new table and swaps it in
+    def __init__(self, series: dict, reference: str, version: str = "empty"):
+        # series: {currency: (sorted day ordinals, rates)}
+        self.series = series
+        self.reference = reference
+        self.version = version
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple], reference: str, version: str) -> "RateTable":
+        # rows: (date or datetime, currency, rate); later duplicates of a (currency, day) win
+        by_currency = {}
+        for day, currency, rate in rows:
+            by_currency.setdefault(currency, {})[day.toordinal() - EPOCH_ORDINAL] = float(rate)
+        series = {}
+        for currency, rates in by_currency.items():
+            if currency == reference:
+                continue
+            days = sorted(rates)
+            series[currency] = (
+                np.array(days, dtype=np.int64), np.array([rates[day] for day in days], dtype=np.float64)
+            )
+        return cls(series, reference, version)
+
+    def knows(self, currency: str) -> bool:
+        return currency == self.reference or currency in self.series
+
+    def currencies(self) -> list:
+        return sorted({self.reference, *self.series})
+
+    def _rates(self, currency: str, days: np.ndarray) -> np.ndarray:
+        if currency == self.reference:
+            return np.ones(len(days))
+        if currency not in self.series:
+            return np.full(len(days), np.nan)
+        known_days, rates = self.series[currency]
+        index = np.searchsorted(known_days, days, side="right") - 1
+        return rates[np.maximum(index, 0)]
+
+    def factors(self, currency: str, target: str, days: np.ndarray) -> np.ndarray:
+        # Conversion factor from `currency` to `target` for each day, memoised per day
+        if currency == target:
+            return np.ones(len(days))
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        values = np.empty(len(unique_days))
+        missing = []
+        for position, day in enumerate(unique_days.tolist()):
+            value = self._memo.get((currency, target, day))
+            if value is None:
+                missing.append(position)
+            else:
+                values[position] = value
+        self.hits += len(unique_days) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            missing_days = unique_days[missing]
+            computed = self._rates(target, missing_days) / self._rates(currency, missing_days)
+            values[missing] = computed
+            if len(self._memo) + len(missing) > settings.FX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo.update(zip(
+                ((currency, target, day) for day in missing_days.tolist()), computed.tolist()
+            ))
+        return values[inverse]
+
+    def convert(
+        self, amounts: np.ndarray, currencies: Sequence[Optional[str]], days: np.ndarray, target: str
+    ) -> np.ndarray:
+        # One pass over the rows: group them by currency, then convert each group as an array
+        codes = {}
+        row_codes = np.fromiter(
+            (codes.setdefault(currency or settings.DEFAULT_CURRENCY, len(codes)) for currency in currencies),
+            dtype=np.int64, count=len(amounts)
+        )
+        if not codes or list(codes) == [target]:
+            return amounts
+        factors = np.ones(len(amounts))
+        for currency, code in codes.items():
+            if currency == target:
+                continue
+            rows = np.flatnonzero(row_codes == code)
+            factors[rows] = self.factors(currency, target, days[rows])
+        unknown = np.isnan(factors)
+        if unknown.any():
+            # No rate on record (e.g. removed after the expense was written): count at face value
+            logger.warning(f"No exchange rate to {target} for {int(unknown.sum())} rows; using face value")
+            factors[unknown] = 1.0
+        return amounts * factors
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "currencies": len(self.series) + 1,
+            "rates": sum(len(days) for days, _ in self.series.values()),
+            "memo_size": len(self._memo),
+            "memo_hits": self.hits,
+            "memo_misses": self.misses,
+        }
+
+
+def _file_fingerprint(path: str):
+    stat = os.stat(path)
+    return ("file", path, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_file(path: str) -> list:
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        for line, row in enumerate(csv.DictReader(handle), start=2):
+            try:
+                rows.append((
+                    date.fromisoformat(row["date"].strip()[:10]),
+                    normalize_currency(row["currency"]),
+                    float(row["rate"]),
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{path}, line {line}: {str(e)}")
+    return rows
+
+
+async def _collection_fingerprint(database=db):
+    latest = await database.fx_rates.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+    count = await database.fx_rates.estimated_document_count()
+    return ("collection", count, latest["updated_at"] if latest else None)
+
+
+async def _read_collection(database=db) -> list:
+    cursor = database.fx_rates.find({}, {"_id": 0, "date": 1, "currency": 1, "rate": 1})
+    return [(doc["date"], doc["currency"], doc["rate"]) async for doc in cursor]
+
+
+class FxRates:
+    # Holds the current RateTable for this worker and refreshes it in the background
+    def __init__(self):
+        self.table = RateTable({}, settings.FX_REFERENCE_CURRENCY)
+        self.loaded_at = None
+        self.refreshes = 0
+        self.failures = 0
+        self._fingerprint = None
+        self._task = None
+
+    async def refresh(self, force: bool = False) -> bool:
+        # Rebuilds the table if its source changed; returns whether it did
+        if settings.FX_RATES_FILE:
+            fingerprint = _file_fingerprint(settings.FX_RATES_FILE)
+        else:
+            fingerprint = await _collection_fingerprint()
+        if fingerprint == self._fingerprint and not force:
+            return False
+
+        if settings.FX_RATES_FILE:
+            rows = await asyncio.to_thread(_read_file, settings.FX_RATES_FILE)
+        else:
+            rows = await _read_collection()
+        # The same source gives the same version in every worker, so ETags agree
+        version = hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12]
+        self.table = RateTable.from_rows(rows, settings.FX_REFERENCE_CURRENCY, version)
+        self._fingerprint = fingerprint
+        self.loaded_at = datetime.utcnow()
+        self.refreshes += 1
+        logger.info(f"Loaded {len(rows)} exchange rates for {len(self.table.series)} currencies (version {version})")
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(settings.FX_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the last good table
+                self.failures += 1
+                logger.error(f"Could not refresh exchange rates: {str(e)}", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            **self.table.stats(),
+            "reference": self.table.reference,
+            "source": settings.FX_RATES_FILE or "fx_rates collection",
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+fx_rates = FxRates()
+
+
+def convert(amounts, currencies: Sequence[Optional[str]], days: np.ndarray, target: str) -> np.ndarray:
+    return fx_rates.table.convert(np.asarray(amounts, dtype=np.float64), currencies, days, target)
+
+
+def validate_currency(currency: Optional[str]) -> str:
+    # Normalised code of a currency the rate table can convert
+    currency = normalize_currency(currency)
+    if not fx_rates.table.knows(currency):
+        raise UnsupportedCurrency(
+            f"Unsupported currency. Must be one of: {', '.join(fx_rates.table.currencies())}"
+        )
+    return currency
+
+
+# Users' base currencies. Entries live as long as data version entries; a change made
+# through another worker shows up once the local entry expires.
+_base_currencies = TTLCache(
+    maxsize=settings.DATA_VERSION_CACHE_SIZE,
+    ttl=settings.DATA_VERSION_CACHE_TTL_SECONDS
+)
+
+
+async def get_base_currency(user_id: str, database=db, session=None) -> str:
+    currency = _base_currencies.get(user_id)
+    if currency is None:
+        user = await database.users.find_one({"_id": ObjectId(user_id)}, {"base_currency": 1}, session=session)
+        currency = (user or {}).get("base_currency") or settings.DEFAULT_CURRENCY
+        _base_currencies.set(user_id, currency)
+    return currency
+
+
+async def set_base_currency(user_id: str, currency: str):
+    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"base_currency": currency}})
+    _base_currencies.set(user_id, currency)
+
+
+async def load_file(path: str, database=db) -> int:
+    # Upsert a rates CSV into the fx_rates collection
+    rows = _read_file(path)
+    now = datetime.utcnow()
+    written = 0
+    for offset in range(0, len(rows), 1000):
+        ops = [
+            UpdateOne(
+                {"currency": currency, "date": datetime.combine(day, datetime.min.time())},
+                {"$set": {"rate": rate, "updated_at": now}},
+                upsert=True,
+            )
+            for day, currency, rate in rows[offset:offset + 1000]
+        ]
+        await database.fx_rates.bulk_write(ops, ordered=False)
+        written += len(ops)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load exchange rates into the fx_rates collection")
+    parser.add_argument("path", help="CSV file with date,currency,rate columns")
+    args = parser.parse_args()
+    written = asyncio.run(load_file(args.path))
+    print(f"Loaded {written} exchange rates; workers pick them up within {settings.FX_REFRESH_SECONDS:g}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from ..core.config import settings
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Per-user cache of computed insights. Entries are stamped with what their result
+# depends on: the user's data version, the date, the base currency and the exchange
+# rate table version. The stamp is the same for every kind of insights, so a
+# user's kinds are cached side by side. A stamp mismatch is a miss, so a write made
+# through another worker is picked up as soon as that worker's version is visible
+# here (within DATA_VERSION_CACHE_TTL_SECONDS). Writes made through this worker
+# invalidate the user's entries immediately.
+#
+# Concurrent misses for the same user, kind and stamp share one computation.
+#
+# The storage is behind InsightsCacheBackend so a shared cache (e.g. Redis) can
+# replace the in-process one; select it with INSIGHTS_CACHE_BACKEND.
+
+
+class InsightsCacheBackend(ABC):
+    # Stores {kind: (stamp, result)} per user. Methods are async so networked
+    # backends fit the same interface.
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: str, entries: dict):
+        ...
+
+    @abstractmethod
+    async def invalidate(self, user_id: str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(InsightsCacheBackend):
+    # Bounded LRU per worker process
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        return self._entries.get(user_id)
+
+    async def set(self, user_id: str, entries: dict):
+        self._entries.set(user_id, entries)
+
+    async def invalidate(self, user_id: str):
+        self._entries.invalidate(user_id)
+
+    async def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+BACKENDS = {
+    "memory": lambda: MemoryBackend(settings.INSIGHTS_CACHE_SIZE, settings.INSIGHTS_CACHE_TTL_SECONDS),
+}
+
+
+class InsightsCache:
+    def __init__(self, backend: InsightsCacheBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(
+        self, user_id: str, kind: str, stamp: Hashable, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if not self.enabled:
+            return await compute()
+
+        entries = await self.backend.get(user_id) or {}
+        cached = entries.get(kind)
+        if cached is not None and cached[0] == stamp:
+            self.hits += 1
+            return cached[1]
+
+        key = (user_id, kind, stamp)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(user_id, kind, stamp, compute))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded so a caller that disconnects doesn't cancel the others' result
+        return await asyncio.shield(task)
+
+    async def _compute(self, user_id: str, kind: str, stamp: Hashable, compute):
+        result = await compute()
+        # Invalidated while computing: the result may predate the write, so don't keep it
+        if self._in_flight.get((user_id, kind, stamp)) is not asyncio.current_task():
+            return result
+        try:
+            entries = await self.backend.get(user_id) or {}
+            # Drop other kinds computed against an older stamp
+            entries = {k: v for k, v in entries.items() if v[0] == stamp}
+            entries[kind] = (stamp, result)
+            await self.backend.set(user_id, entries)
+        except Exception as e:
+            logger.warning(f"Could not cache insights: {str(e)}")
+        return result
+
+    def _forget(self, key: tuple, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def invalidate(self, user_id: str):
+        for key in [key for key in self._in_flight if key[0] == user_id]:
+            del self._in_flight[key]
+        await self.backend.invalidate(user_id)
+
+    async def clear(self):
+        self._in_flight.clear()
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def _make_backend(name: str) -> InsightsCacheBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INSIGHTS_CACHE_BACKEND: {name}")
+    return BACKENDS[name]()
+
+
+insights_cache = InsightsCache(
+    _make_backend(settings.INSIGHTS_CACHE_BACKEND), enabled=settings.INSIGHTS_CACHE_ENABLED
+)
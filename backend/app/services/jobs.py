@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from ..core.config import settings
+from ..core.database import db
+from ..core.metrics import Counter, registry
+
+# Background jobs for bulk deletes. Job state lives in the `jobs` collection, so a
+# job survives the worker that started it: every worker polls for pending jobs and
+# for running jobs whose owner stopped heartbeating, claims one atomically, and
+# continues from the progress recorded after its last batch.
+#
+# Each job is a list of (collection, query) steps. A step deletes its matching
+# documents in batches of JOB_BATCH_SIZE, in _id order: it reads the next batch of
+# ids after the recorded cursor, deletes those ids, records the new cursor,
+# then sleeps JOB_BATCH_DELAY_SECONDS so the primary keeps headroom for requests.
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+jobs_total = registry.register(Counter(
+    "jobs_total", "Background jobs finished, by type and status", ("type", "status")
+))
+job_documents_deleted_total = registry.register(Counter(
+    "job_documents_deleted_total", "Documents deleted by background jobs", ("collection",)
+))
+
+
+def _delete_user_steps(params: dict) -> list:
+    # The account, its refresh tokens and data version are removed by the request itself
+    user_id = params["user_id"]
+    return [
+        ("expenses", {"user_id": user_id}),
+        ("expense_rollups", {"user_id": user_id}),
+        ("expense_tombstones", {"user_id": user_id}),
+        ("description_suggestions", {"user_id": user_id}),
+    ]
+
+
+def _clear_all_steps(params: dict) -> list:
+    # Accounts and refresh tokens first, so nobody can sign in while the rest is removed
+    return [
+        (name, {})
+        for name in (
+            "users", "refresh_tokens", "expenses", "expense_rollups", "expense_tombstones", "data_versions",
+            "description_suggestions",
+        )
+    ]
+
+
+JOB_TYPES = {
+    "delete_user": _delete_user_steps,
+    "clear_all": _clear_all_steps,
+}
+
+
+class LeaseLost(Exception):
+    # Another worker took the job over after this one missed its heartbeat
+    pass
+
+
+def job_to_dict(job: dict) -> dict:
+    # Public view of a job: no parameters and no internal cursors
+    return {
+        "id": job["_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "progress": {
+            collection: {key: step.get(key) for key in ("deleted", "total", "done")}
+            for collection, step in job.get("progress", {}).items()
+        },
+        "attempts": job.get("attempts", 0),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+async def get_job(job_id: str, database=db) -> Optional[dict]:
+    return await database.jobs.find_one({"_id": job_id})
+
+
+class JobRunner:
+    def __init__(self, database=db):
+        self.database = database
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks = {}
+        self._stopping = False
+        self._wake: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    async def submit(self, job_type: str, params: dict) -> str:
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}")
+        now = datetime.utcnow()
+        # Random ids: the status URL is handed to callers whose account may no longer exist
+        job_id = uuid.uuid4().hex
+        await self.database.jobs.insert_one({
+            "_id": job_id,
+            "type": job_type,
+            "params": params,
+            "status": PENDING,
+            "progress": {},
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+        if self._wake is not None:
+            self._wake.set()
+        return job_id
+
+    def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        # Jobs interrupted here go back to pending and resume from their last batch
+        self._stopping = True
+        if self._poller is not None:
+            # Woken rather than cancelled, so it never stops between claiming a job and starting it
+            self._wake.set()
+            await self._poller
+            self._poller = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await self.database.jobs.update_many(
+                {"owner": self.worker_id, "status": RUNNING},
+                {"$set": {"status": PENDING, "updated_at": datetime.utcnow()}, "$unset": {"owner": ""}}
+            )
+        except Exception as e:
+            logger.warning(f"Could not release running jobs: {str(e)}")
+
+    def stats(self) -> dict:
+        return {"worker": self.worker_id, "running": sorted(self._tasks)}
+
+    async def _poll(self):
+        while not self._stopping:
+            try:
+                while len(self._tasks) < settings.JOB_MAX_CONCURRENCY and not self._stopping:
+                    job = await self._claim()
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._run(job))
+                    self._tasks[job["_id"]] = task
+                    task.add_done_callback(lambda _, job_id=job["_id"]: self._finished(job_id))
+            except Exception as e:
+                logger.error(f"Error polling for jobs: {str(e)}", exc_info=True)
+            if self._stopping:
+                break
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _finished(self, job_id: str):
+        self._tasks.pop(job_id, None)
+        # A slot is free; look for more work straight away
+        self._wake.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        return await self.database.jobs.find_one_and_update(
+            {
+                "_id": {"$nin": list(self._tasks)},
+                "$or": [
+                    {"status": PENDING},
+                    {"status": RUNNING, "heartbeat_at": {"$lt": stale}},
+                ],
+            },
+            {
+                "$set": {"status": RUNNING, "owner": self.worker_id, "heartbeat_at": now, "updated_at": now},
+                "$min": {"started_at": now},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _save(self, job_id: str, fields: dict):
+        now = datetime.utcnow()
+        result = await self.database.jobs.update_one(
+            {"_id": job_id, "owner": self.worker_id},
+            {"$set": {**fields, "heartbeat_at": now, "updated_at": now}}
+        )
+        if result.matched_count == 0:
+            raise LeaseLost(job_id)
+
+    async def _run(self, job: dict):
+        job_id = job["_id"]
+        try:
+            for collection, query in JOB_TYPES[job["type"]](job.get("params", {})):
+                step = job.get("progress", {}).get(collection, {})
+                if not step.get("done"):
+                    await self._delete_step(job_id, collection, query, step)
+        except LeaseLost:
+            logger.warning(f"Job {job_id} was taken over by another worker")
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            attempts = job.get("attempts", 0) + 1
+            status = FAILED if attempts >= settings.JOB_MAX_ATTEMPTS else PENDING
+            await self.database.jobs.update_one(
+                {"_id": job_id, "owner": self.worker_id},
+                {
+                    "$set": {
+                        "status": status, "attempts": attempts, "error": str(e), "updated_at": datetime.utcnow(),
+                        **({"finished_at": datetime.utcnow()} if status == FAILED else {}),
+                    },
+                    "$unset": {"owner": ""},
+                }
+            )
+            if status == FAILED:
+                jobs_total.inc(job["type"], FAILED)
+            return
+
+        await self.database.jobs.update_one(
+            {"_id": job_id, "owner": self.worker_id},
+            {
+                "$set": {"status": COMPLETED, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+                "$unset": {"owner": "", "error": ""},
+            }
+        )
+        jobs_total.inc(job["type"], COMPLETED)
+        logger.info(f"Job {job_id} ({job['type']}) completed")
+
+    async def _delete_step(self, job_id: str, collection: str, query: dict, step: dict):
+        coll = self.database[collection]
+        step = {"deleted": step.get("deleted", 0), "total": step.get("total"), "after": step.get("after")}
+        if step["total"] is None:
+            # Recorded once, so resumed jobs keep reporting against the original size
+            step["total"] = await coll.count_documents(query) if query else await coll.estimated_document_count()
+            await self._save(job_id, {f"progress.{collection}": {**step, "done": False}})
+
+        while True:
+            batch_query = dict(query)
+            if step["after"] is not None:
+                batch_query["_id"] = {"$gt": step["after"]}
+            ids = [
+                doc["_id"] async for doc in
+                coll.find(batch_query, {"_id": 1}).sort("_id", ASCENDING).limit(settings.JOB_BATCH_SIZE)
+            ]
+            if not ids:
+                break
+            # Exactly the ids read: documents inserted into the range meanwhile are not this job's
+            result = await coll.delete_many({**query, "_id": {"$in": ids}})
+            step["deleted"] += result.deleted_count
+            step["after"] = ids[-1]
+            job_documents_deleted_total.inc(collection, amount=result.deleted_count)
+            await self._save(job_id, {f"progress.{collection}": {**step, "done": False}})
+            if len(ids) < settings.JOB_BATCH_SIZE:
+                break
+            await asyncio.sleep(settings.JOB_BATCH_DELAY_SECONDS)
+
+        await self._save(job_id, {f"progress.{collection}": {**step, "done": True}})
+
+
+job_runner = JobRunner()
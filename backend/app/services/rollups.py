@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.database import db
+
+logger = logging.getLogger(__name__)
+
+# Rollup documents look like:
+#   {"user_id": ..., "period": "day" | "month", "start": datetime, "currency": str,
+#    "total": float, "count": int}
+# There is exactly one document per (user_id, period, start, currency), kept current
+# with $inc. Totals stay in the expenses' own currency; readers convert them.
+DAY = "day"
+MONTH = "month"
+PERIODS = (DAY, MONTH)
+
+
+def _as_naive_utc(value: datetime) -> datetime:
+    # MongoDB stores UTC and hands back naive datetimes; normalise aware values the same way
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def day_start(value: datetime) -> datetime:
+    value = _as_naive_utc(value)
+    return datetime(value.year, value.month, value.day)
+
+
+def month_start(value: datetime) -> datetime:
+    value = _as_naive_utc(value)
+    return datetime(value.year, value.month, 1)
+
+
+def _period_keys(date: datetime):
+    return ((DAY, day_start(date)), (MONTH, month_start(date)))
+
+
+def _delta_ops(user_id: str, deltas: dict) -> list:
+    return [
+        UpdateOne(
+            {"user_id": user_id, "period": period, "start": start, "currency": currency},
+            {"$inc": {"total": total, "count": count}},
+            upsert=True,
+        )
+        for (period, start, currency), (total, count) in deltas.items()
+        if total or count
+    ]
+
+
+def _accumulate(deltas: dict, date: datetime, amount: float, currency: Optional[str], sign: int):
+    currency = currency or settings.DEFAULT_CURRENCY
+    for period, start in _period_keys(date):
+        key = (period, start, currency)
+        total, count = deltas.get(key, (0.0, 0))
+        deltas[key] = (total + sign * amount, count + sign)
+
+
+async def _apply(user_id: str, deltas: dict):
+    ops = _delta_ops(user_id, deltas)
+    if not ops:
+        return
+    await db.expense_rollups.bulk_write(ops, ordered=False)
+
+    # Drop buckets that no longer hold any expense so reads never see empty days
+    emptied = [
+        {"period": period, "start": start, "currency": currency}
+        for (period, start, currency), (_, count) in deltas.items()
+        if count < 0
+    ]
+    if emptied:
+        await db.expense_rollups.delete_many({
+            "user_id": user_id,
+            "$or": emptied,
+            "count": {"$lte": 0},
+        })
+
+
+async def record_expense(user_id: str, date: datetime, amount: float, currency: Optional[str]):
+    deltas = {}
+    _accumulate(deltas, date, amount, currency, 1)
+    await _apply(user_id, deltas)
+
+
+async def record_expenses(user_id: str, expenses: Iterable[dict]):
+    # Batch variant for multi-row writes: one bulk_write per call
+    deltas = {}
+    for expense in expenses:
+        _accumulate(deltas, expense["date"], expense["amount"], expense.get("currency"), 1)
+    await _apply(user_id, deltas)
+
+
+async def unrecord_expense(user_id: str, date: datetime, amount: float, currency: Optional[str]):
+    deltas = {}
+    _accumulate(deltas, date, amount, currency, -1)
+    await _apply(user_id, deltas)
+
+
+async def move_expense(
+    user_id: str,
+    old_date: datetime,
+    old_amount: float,
+    old_currency: Optional[str],
+    new_date: datetime,
+    new_amount: float,
+    new_currency: Optional[str],
+):
+    deltas = {}
+    _accumulate(deltas, old_date, old_amount, old_currency, -1)
+    _accumulate(deltas, new_date, new_amount, new_currency, 1)
+    await _apply(user_id, deltas)
+
+
+async def get_rollups(
+    user_id: str,
+    period: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    database=db,
+    session=None,
+) -> list:
+    query = {"user_id": user_id, "period": period}
+    if start is not None or end is not None:
+        query["start"] = {}
+        if start is not None:
+            query["start"]["$gte"] = start
+        if end is not None:
+            query["start"]["$lt"] = end
+    cursor = database.expense_rollups.find(
+        query, {"_id": 0, "start": 1, "currency": 1, "total": 1, "count": 1}, session=session
+    ).sort("start", 1)
+    return await cursor.to_list(length=None)
+
+
+async def rebuild_rollups(user_id: Optional[str] = None) -> int:
+    # Recompute rollups from the expenses collection, for backfills or repairs
+    match = {"user_id": user_id} if user_id else {}
+    written = 0
+    for period in PERIODS:
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "start": {"$dateTrunc": {"date": "$date", "unit": period}},
+                    "currency": {"$ifNull": ["$currency", settings.DEFAULT_CURRENCY]},
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }},
+        ]
+        await db.expense_rollups.delete_many({**match, "period": period})
+
+        batch = []
+        async for row in db.expenses.aggregate(pipeline, allowDiskUse=True):
+            batch.append({
+                "user_id": row["_id"]["user_id"],
+                "period": period,
+                "start": row["_id"]["start"],
+                "currency": row["_id"]["currency"],
+                "total": row["total"],
+                "count": row["count"],
+            })
+            if len(batch) >= 1000:
+                await db.expense_rollups.insert_many(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            await db.expense_rollups.insert_many(batch, ordered=False)
+            written += len(batch)
+
+    logger.info(f"Rebuilt {written} expense rollups" + (f" for user {user_id}" if user_id else ""))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild expense rollups from the expenses collection")
+    parser.add_argument("--user-id", help="Only rebuild rollups for this user")
+    args = parser.parse_args()
+    written = asyncio.run(rebuild_rollups(args.user_id))
+    print(f"Wrote {written} rollup documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import bisect
+import heapq
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from pymongo import UpdateOne
+
+from ..core.config import settings
+from ..core.database import db
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Description autocomplete. Suggestion documents look like:
+#   {"user_id": ..., "text": normalised description, "description": latest spelling,
+#    "count": int, "last_used": datetime}
+# with one document per (user_id, text), kept current by the expense write endpoints
+# with $inc, like rollups. A lookup loads the user's SUGGEST_MAX_DESCRIPTIONS most
+# frequent texts once into a list sorted by text and cached locally; a prefix is
+# then a bisect over that list. Writes through this worker drop the cached list;
+# others pick up changes within SUGGEST_CACHE_TTL_SECONDS.
+
+MAX_TEXT_LENGTH = 200
+
+_prefix_index = TTLCache(maxsize=settings.SUGGEST_CACHE_SIZE, ttl=settings.SUGGEST_CACHE_TTL_SECONDS)
+
+
+def normalize(description: Optional[str]) -> str:
+    return " ".join(str(description or "").lower().split())[:MAX_TEXT_LENGTH]
+
+
+def _accumulate(deltas: dict, description: Optional[str], sign: int):
+    text = normalize(description)
+    if not text:
+        return
+    count, spelling = deltas.get(text, (0, None))
+    deltas[text] = (count + sign, description.strip() if sign > 0 else spelling)
+
+
+async def _apply(user_id: str, deltas: dict):
+    now = datetime.utcnow()
+    ops = []
+    for text, (count, spelling) in deltas.items():
+        if count > 0:
+            ops.append(UpdateOne(
+                {"user_id": user_id, "text": text},
+                {"$inc": {"count": count}, "$set": {"description": spelling, "last_used": now}},
+                upsert=True,
+            ))
+        elif count < 0:
+            # Descriptions written before suggestions existed have no document; nothing to undo
+            ops.append(UpdateOne({"user_id": user_id, "text": text}, {"$inc": {"count": count}}))
+    if not ops:
+        return
+    await db.description_suggestions.bulk_write(ops, ordered=False)
+
+    emptied = [text for text, (count, _) in deltas.items() if count < 0]
+    if emptied:
+        await db.description_suggestions.delete_many({
+            "user_id": user_id,
+            "text": {"$in": emptied},
+            "count": {"$lte": 0},
+        })
+    _prefix_index.invalidate(user_id)
+
+
+async def record_descriptions(user_id: str, descriptions: Iterable[Optional[str]]):
+    deltas = {}
+    for description in descriptions:
+        _accumulate(deltas, description, 1)
+    await _apply(user_id, deltas)
+
+
+async def unrecord_description(user_id: str, description: Optional[str]):
+    deltas = {}
+    _accumulate(deltas, description, -1)
+    await _apply(user_id, deltas)
+
+
+async def move_description(user_id: str, old_description: Optional[str], new_description: Optional[str]):
+    deltas = {}
+    _accumulate(deltas, old_description, -1)
+    _accumulate(deltas, new_description, 1)
+    await _apply(user_id, deltas)
+
+
+async def _load(user_id: str, database=db, session=None) -> tuple:
+    entries = _prefix_index.get(user_id)
+    if entries is None:
+        cursor = database.description_suggestions.find(
+            {"user_id": user_id, "count": {"$gt": 0}},
+            {"_id": 0, "text": 1, "description": 1, "count": 1},
+            session=session
+        ).sort("count", -1).limit(settings.SUGGEST_MAX_DESCRIPTIONS)
+        docs = sorted(await cursor.to_list(length=None), key=lambda doc: doc["text"])
+        entries = ([doc["text"] for doc in docs], docs)
+        _prefix_index.set(user_id, entries)
+    return entries
+
+
+async def suggest(user_id: str, prefix: str, limit: int, database=db, session=None) -> list:
+    # The most frequent descriptions starting with `prefix`, ignoring case and spacing
+    texts, docs = await _load(user_id, database=database, session=session)
+    prefix = normalize(prefix)
+    start = bisect.bisect_left(texts, prefix)
+    # Above every text with the prefix: strings compare by code point, and U+10FFFF,
+    # the highest, is a noncharacter that real descriptions don't contain
+    end = bisect.bisect_left(texts, prefix + chr(0x10FFFF), lo=start)
+    best = heapq.nlargest(limit, docs[start:end], key=lambda doc: doc["count"])
+    return [{"description": doc["description"], "count": doc["count"]} for doc in best]
+
+
+def cache_stats() -> dict:
+    return _prefix_index.stats()
+
+
+async def rebuild_suggestions(user_id: Optional[str] = None) -> int:
+    # Recompute suggestions from the expenses collection, for backfills or repairs
+    user_ids = [user_id] if user_id else await db.expenses.distinct("user_id")
+    written = 0
+    for uid in user_ids:
+        pipeline = [
+            {"$match": {"user_id": uid}},
+            {"$group": {"_id": "$description", "count": {"$sum": 1}, "last_used": {"$max": "$date"}}},
+        ]
+        merged = {}
+        async for row in db.expenses.aggregate(pipeline, allowDiskUse=True):
+            text = normalize(row["_id"])
+            if not text:
+                continue
+            current = merged.get(text)
+            if current is None or row["last_used"] > current["last_used"]:
+                merged[text] = {
+                    "user_id": uid, "text": text, "description": row["_id"].strip(),
+                    "count": row["count"] + (current["count"] if current else 0),
+                    "last_used": row["last_used"],
+                }
+            else:
+                current["count"] += row["count"]
+
+        await db.description_suggestions.delete_many({"user_id": uid})
+        documents = list(merged.values())
+        for offset in range(0, len(documents), 1000):
+            await db.description_suggestions.insert_many(documents[offset:offset + 1000], ordered=False)
+        written += len(documents)
+        _prefix_index.invalidate(uid)
+
+    logger.info(f"Rebuilt {written} description suggestions" + (f" for user {user_id}" if user_id else ""))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild description suggestions from the expenses collection")
+    parser.add_argument("--user-id", help="Only rebuild suggestions for this user")
+    args = parser.parse_args()
+    written = asyncio.run(rebuild_suggestions(args.user_id))
+    print(f"Wrote {written} suggestion documents")
+
+
+if __name__ == "__main__":
+    main()
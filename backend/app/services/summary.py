@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.database import db
+from . import fx, rollups
+from .expense_filters import build_expense_filter
+
+logger = logging.getLogger(__name__)
+
+TIME_GROUPINGS = ("day", "week", "month")
+
+
+def _aligned(value: Optional[datetime], group_by: str) -> bool:
+    if value is None:
+        return True
+    if group_by == rollups.DAY:
+        return value == rollups.day_start(value)
+    return value == rollups.month_start(value)
+
+
+def _can_use_rollups(group_by, start, end, categories) -> bool:
+    # Rollups hold exact per-day/per-month totals, so they answer any unfiltered
+    # day/month summary whose range falls on bucket boundaries
+    return (
+        group_by in rollups.PERIODS
+        and not categories
+        and _aligned(start, group_by)
+        and _aligned(end, group_by)
+    )
+
+
+def build_summary_pipeline(
+    user_id: str,
+    group_by: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    categories: Optional[Sequence[str]] = None,
+    currency: Optional[str] = None,
+) -> list:
+    currency = currency or settings.DEFAULT_CURRENCY
+    if group_by == "category":
+        group_key = "$category"
+    else:
+        trunc = {"date": "$date", "unit": group_by}
+        if group_by == "week":
+            trunc["startOfWeek"] = "monday"
+        group_key = {"$dateTrunc": trunc}
+
+    # Amounts in another currency convert at their day's rate, so they are also split
+    # by day; amounts already in `currency` need no rate and stay one row per key
+    expense_currency = {"$ifNull": ["$currency", settings.DEFAULT_CURRENCY]}
+    return [
+        {"$match": build_expense_filter(user_id, start, end, categories)},
+        {"$group": {
+            "_id": {
+                "key": group_key,
+                "currency": expense_currency,
+                "day": {"$cond": [
+                    {"$eq": [expense_currency, currency]}, None, {"$dateTrunc": {"date": "$date", "unit": "day"}}
+                ]},
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0, "key": "$_id.key", "currency": "$_id.currency", "day": "$_id.day", "total": 1, "count": 1
+        }},
+    ]
+
+
+def _key_order(row: dict):
+    # MongoDB's order for summary keys: nulls first
+    return (row["key"] is not None, row["key"])
+
+
+def _in_currency(rows: list, currency: str) -> list:
+    # rows carry "key", "currency", "day", "total" and "count". Every total is converted
+    # into `currency` in one vectorised pass, then rows sharing a key are summed.
+    if not rows:
+        return []
+    count = len(rows)
+    totals = fx.convert(
+        np.fromiter((row["total"] for row in rows), dtype=np.float64, count=count),
+        [row["currency"] for row in rows],
+        fx.day_ordinals(row["day"] for row in rows),
+        currency,
+    )
+    keys = {}
+    codes = np.fromiter((keys.setdefault(row["key"], len(keys)) for row in rows), dtype=np.int64, count=count)
+    sums = np.bincount(codes, weights=totals, minlength=len(keys))
+    counts = np.bincount(
+        codes, weights=np.fromiter((row["count"] for row in rows), dtype=np.float64, count=count),
+        minlength=len(keys)
+    )
+    merged = [
+        {"key": key, "total": total, "count": int(n)}
+        for key, total, n in zip(keys, sums.tolist(), counts.tolist())
+    ]
+    merged.sort(key=_key_order)
+    return merged
+
+
+async def summarize_expenses(
+    user_id: str,
+    group_by: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    categories: Optional[Sequence[str]] = None,
+    currency: Optional[str] = None,
+    database=db,
+    session=None,
+) -> list:
+    # Returns [{"key": bucket start or category, "total": float, "count": int}] sorted by
+    # key, with totals in `currency`
+    currency = currency or settings.DEFAULT_CURRENCY
+    if _can_use_rollups(group_by, start, end, categories):
+        rows = await rollups.get_rollups(user_id, group_by, start, end, database=database, session=session)
+        if all(row["currency"] == currency for row in rows):
+            return [{"key": row["start"], "total": row["total"], "count": row["count"]} for row in rows]
+        if group_by == rollups.MONTH:
+            # Other currencies convert at each day's rate, so months are summed from day buckets
+            rows = await rollups.get_rollups(user_id, rollups.DAY, start, end, database=database, session=session)
+        bucket = rollups.month_start if group_by == rollups.MONTH else rollups.day_start
+        return _in_currency([
+            {
+                "key": bucket(row["start"]), "currency": row["currency"], "day": row["start"],
+                "total": row["total"], "count": row["count"],
+            }
+            for row in rows
+        ], currency)
+
+    pipeline = build_summary_pipeline(user_id, group_by, start, end, categories, currency)
+    rows = await database.expenses.aggregate(pipeline, session=session).to_list(length=None)
+    return _in_currency(rows, currency)
+
+
+def build_insights(daily: list, monthly: list, now: Optional[datetime] = None) -> dict:
+    # daily/monthly are summary rows sorted by key
+    now = now or datetime.now()
+    if not daily:
+        return {
+            "total_monthly_expense": 0,
+            "average_monthly_expense": 0,
+            "average_weekly_expense": 0,
+            "daily_insights": []
+        }
+
+    # Monthly insights come straight from the current month bucket
+    current_month = rollups.month_start(now)
+    month_row = next((row for row in monthly if row["key"] == current_month), None)
+    total_monthly_expense = month_row["total"] if month_row else 0
+    month_count = month_row["count"] if month_row else 0
+    average_monthly_expense = total_monthly_expense / max(month_count, 1)
+
+    # Weekly insights: the last seven days, plus anything dated ahead of today
+    week_start = rollups.day_start(now) - timedelta(days=7)
+    week_total = 0
+    week_count = 0
+    for row in daily:
+        if row["key"] >= week_start:
+            week_total += row["total"]
+            week_count += row["count"]
+    average_weekly_expense = week_total / max(week_count, 1)
+
+    # Daily insights compare each day against the running average of the days before it
+    totals = np.fromiter((row["total"] for row in daily), dtype=np.float64, count=len(daily))
+    averages = np.cumsum(totals)[:-1] / np.arange(1, len(totals))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        differences = np.where(averages > 0, np.abs((totals[1:] - averages) / averages * 100), 0.0)
+    daily_insights = [
+        {
+            "date": row["key"].date().isoformat(),
+            "amount": row["total"],
+            "performance": "below_average" if below else "above_average",
+            "difference_percentage": difference
+        }
+        for row, below, difference in zip(daily[1:], (totals[1:] < averages).tolist(), differences.tolist())
+    ]
+
+    return {
+        "total_monthly_expense": total_monthly_expense,
+        "average_monthly_expense": average_monthly_expense,
+        "average_weekly_expense": average_weekly_expense,
+        "daily_insights": daily_insights
+    }
+
+
+async def get_insights(user_id: str, currency: Optional[str] = None, database=db, session=None) -> dict:
+    now = datetime.now()
+    currency = currency or settings.DEFAULT_CURRENCY
+    daily = await summarize_expenses(user_id, "day", currency=currency, database=database, session=session)
+    monthly = await summarize_expenses(
+        user_id, "month", start=rollups.month_start(now), currency=currency, database=database, session=session
+    )
+    return {"currency": currency, **build_insights(daily, monthly, now)}
@@ -0,0 +1,107 @@
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from ..core.config import settings
+from ..core.database import db
+from . import data_versions
+
+# Every expense write reserves the user's next change sequence number (see
+# data_versions.reserve_seq) as its `seq`; deletes leave a tombstone carrying that
+# seq. A sync token is the (seq, _id) of the last change a client has seen, so a
+# sync reads only what changed after it. Reads stop at the user's sync watermark,
+# so a token never passes a write that has its seq but has not finished. Expenses
+# written before seq existed carry seq 0.
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(seq: int, object_id: Optional[ObjectId]) -> str:
+    raw = json.dumps(
+        {"s": seq, "i": str(object_id) if object_id else None, "t": int(time.time())},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {
+            "seq": int(data["s"]),
+            "id": ObjectId(data["i"]) if data.get("i") else None,
+            "issued_at": int(data["t"]),
+        }
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidSyncToken("Invalid sync token") from e
+
+
+def _between(seq: int, object_id: Optional[ObjectId], upto: int) -> dict:
+    # Changes after (seq, object_id), up to and including seq `upto`
+    if object_id is None:
+        return {"seq": {"$gt": seq, "$lte": upto}}
+    return {
+        "seq": {"$lte": upto},
+        "$or": [
+            {"seq": {"$gt": seq}},
+            {"seq": seq, "_id": {"$gt": object_id}},
+        ],
+    }
+
+
+async def record_deletion(user_id: str, expense_id: ObjectId, seq: int):
+    await db.expense_tombstones.insert_one({
+        "_id": expense_id,
+        "user_id": user_id,
+        "seq": seq,
+        "deleted_at": datetime.utcnow()
+    })
+
+
+async def get_changes(user_id: str, token: Optional[str], limit: int) -> dict:
+    # Returns {"updated": [expense docs], "deleted": [ids], "token": str, "has_more": bool, "reset": bool}
+    seq, after_id, reset = -1, None, token is None
+    if token:
+        state = decode_token(token)
+        # Tombstones older than the retention window are gone, so old tokens start over
+        retention = settings.SYNC_TOMBSTONE_RETENTION_DAYS * 86400
+        if time.time() - state["issued_at"] > retention:
+            reset = True
+        else:
+            seq, after_id = state["seq"], state["id"]
+
+    upto = await data_versions.get_sync_watermark(user_id)
+    query = {"user_id": user_id, **_between(seq, after_id, upto)}
+    sort = [("seq", 1), ("_id", 1)]
+    updated = await db.expenses.find(query).sort(sort).limit(limit + 1).to_list(length=None)
+    deleted = await db.expense_tombstones.find(query, {"seq": 1}).sort(sort).limit(limit + 1).to_list(length=None)
+
+    # Merge both streams in (seq, _id) order and cut the page at `limit`
+    changes = sorted(
+        [(doc["seq"], doc["_id"], False, doc) for doc in updated]
+        + [(doc["seq"], doc["_id"], True, doc) for doc in deleted],
+        key=lambda change: (change[0], change[1])
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    if changes:
+        last_seq, last_id = changes[-1][0], changes[-1][1]
+    else:
+        last_seq, last_id = seq, after_id
+
+    return {
+        "updated": [doc for _, _, is_deleted, doc in changes if not is_deleted],
+        "deleted": [str(object_id) for _, object_id, is_deleted, _ in changes if is_deleted],
+        "token": encode_token(last_seq, last_id),
+        "has_more": has_more,
+        "reset": reset,
+    }
@@ -0,0 +1,172 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+
+from ..core.config import settings
+from ..core.metrics import Counter, Gauge, registry
+from .auth import get_current_user
+from .cache import TTLCache
+
+# Admission control for expensive routes. A token bucket per client caps each
+# caller's request rate (429), and a per-route concurrency limit with a bounded
+# wait queue caps the total work in flight (503). Both fail fast with Retry-After
+# rather than letting requests pile up on the event loop.
+
+admission_requests_total = registry.register(Counter(
+    "admission_requests_total", "Admission decisions by route and outcome (admitted, queued, shed, rate_limited)",
+    ("route", "outcome")
+))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Requests admitted and currently running", ("route",)
+))
+admission_queued = registry.register(Gauge(
+    "admission_queued", "Requests waiting for a concurrency slot", ("route",)
+))
+
+
+def _parse_limits(spec: str) -> dict:
+    # "token=16/64,insights=32/128" -> {"token": (16.0, 64.0), "insights": (32.0, 128.0)}
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item and "/" in item:
+            name, values = item.split("=", 1)
+            first, second = values.split("/", 1)
+            limits[name.strip()] = (float(first), float(second))
+    return limits
+
+
+class ConcurrencyLimiter:
+    # At most `limit` requests run at once and at most `max_queue` wait for a slot;
+    # beyond that, or after waiting `timeout` seconds, requests are shed
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                return False
+            admission_requests_total.inc(self.name, "queued")
+            self.waiting += 1
+            admission_queued.inc(self.name)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.waiting -= 1
+                admission_queued.dec(self.name)
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        admission_in_flight.inc(self.name)
+        return True
+
+    def release(self):
+        self.active -= 1
+        admission_in_flight.dec(self.name)
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "max_queue": self.max_queue, "active": self.active, "waiting": self.waiting}
+
+
+class RateLimiter:
+    # One token bucket per key, refilled at `per_minute` tokens a minute up to `burst`.
+    # Idle buckets age out of the bounded cache; a missing bucket is a full one.
+    def __init__(self, per_minute: float, burst: float, max_keys: int):
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self._buckets = TTLCache(maxsize=max_keys, ttl=self.burst / self.rate if self.rate > 0 else 3600)
+
+    def take(self, key) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is available
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets.set(key, (tokens - 1, now))
+            return 0.0
+        self._buckets.set(key, (tokens, now))
+        return (1 - tokens) / self.rate if self.rate > 0 else 60.0
+
+
+_concurrency = _parse_limits(settings.ADMISSION_LIMITS)
+_rates = _parse_limits(settings.RATE_LIMITS)
+limiters = {
+    name: ConcurrencyLimiter(name, int(limit), int(queue), settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    for name, (limit, queue) in _concurrency.items()
+}
+rate_limiters = {
+    name: RateLimiter(per_minute, burst, settings.RATE_LIMIT_MAX_KEYS)
+    for name, (per_minute, burst) in _rates.items()
+}
+
+
+@asynccontextmanager
+async def _admit(name: str, key):
+    rate_limiter = rate_limiters.get(name)
+    if rate_limiter is not None:
+        wait = rate_limiter.take(key)
+        if wait > 0:
+            admission_requests_total.inc(name, "rate_limited")
+            raise HTTPException(
+                status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    limiter = limiters.get(name)
+    if limiter is None:
+        admission_requests_total.inc(name, "admitted")
+        yield
+        return
+    if not await limiter.acquire():
+        admission_requests_total.inc(name, "shed")
+        raise HTTPException(
+            status_code=503, detail="Server busy, retry later",
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)}
+        )
+    admission_requests_total.inc(name, "admitted")
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def admit_by_ip(name: str):
+    # For routes called before there is a user, such as /token and /users
+    async def dependency(request: Request):
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        async with _admit(name, _client_ip(request)):
+            yield
+    return dependency
+
+
+def admit_by_user(name: str):
+    async def dependency(user_id: str = Depends(get_current_user)):
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        async with _admit(name, user_id):
+            yield
+    return dependency
+
+
+def admission_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -1,27 +1,96 @@
+import secrets
+import time
 from datetime import datetime, timedelta
-from typing import Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from ..core.config import settings
 from ..core.database import db
-from bson import ObjectId
-from ..models.user import User
-from passlib.hash import bcrypt
+from ..models.user import UserProfileResponse
+from .cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Token subject (username) -> {"user_id", "username", "email"}
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_CACHE_SIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+# Revoked tokens are recorded in the token_revocations collection so every worker
+# honours them: one document per deleted user, plus REVOKE_ALL for /admin/clear-users.
+# Access tokens, and refresh tokens at rotation, issued before a document's
+# valid_after are rejected. Documents expire once every token they cover has. Each
+# worker caches a user's cutoff for AUTH_REVOCATION_TTL_SECONDS, which bounds how
+# long another worker's revocation takes to apply here.
+REVOKE_ALL = "*"
+
+# User id -> issued-at cutoff for that user's tokens
+_tokens_valid_after = TTLCache(
+    maxsize=settings.AUTH_CACHE_SIZE,
+    ttl=settings.AUTH_REVOCATION_TTL_SECONDS
+)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password: str, hashed_password: str):
-    return bcrypt.verify(plain_password, hashed_password)
+def token_claims(user: dict) -> dict:
+    # Optionally embed the user id so authenticated requests need no user lookup
+    claims = {"sub": user["username"]}
+    if settings.JWT_EMBED_USER_ID:
+        claims["uid"] = str(user["_id"])
+        claims["email"] = user.get("email", "")
+    return claims
+
+def cache_principal(user: dict) -> dict:
+    principal = {
+        "user_id": str(user["_id"]),
+        "username": user["username"],
+        "email": user.get("email", "")
+    }
+    principal_cache.set(user["username"], principal)
+    return principal
+
+async def _record_revocation(key: str, valid_after: int, lifetime: timedelta):
+    await db.token_revocations.update_one(
+        {"_id": key},
+        {
+            "$max": {"valid_after": valid_after},
+            "$set": {"expires_at": datetime.utcnow() + lifetime},
+        },
+        upsert=True
+    )
+
+async def revoke_user_tokens(username: str, user_id: str):
+    principal_cache.invalidate(username)
+    # iat has one-second resolution; tokens from the second of the deletion go too
+    valid_after = int(time.time()) + 1
+    # The user's refresh tokens are deleted outright, so only access tokens are left
+    await _record_revocation(user_id, valid_after, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    _tokens_valid_after.set(user_id, valid_after)
+
+async def revoke_all_tokens():
+    principal_cache.clear()
+    # Refresh tokens are deleted by the clear_all job, which may take a while to get there
+    await _record_revocation(REVOKE_ALL, int(time.time()), timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    _tokens_valid_after.clear()
+
+async def tokens_valid_after(user_id: str) -> int:
+    valid_after = _tokens_valid_after.get(user_id)
+    if valid_after is None:
+        cursor = db.token_revocations.find({"_id": {"$in": [user_id, REVOKE_ALL]}}, {"valid_after": 1})
+        valid_after = max([doc["valid_after"] async for doc in cursor], default=0)
+        _tokens_valid_after.set(user_id, valid_after)
+    return valid_after
+
+def auth_cache_stats() -> dict:
+    return principal_cache.stats()
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -35,33 +104,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
-    user = await db.users.find_one({"username": username})
-    if user is None:
+    # Tokens carrying the user id need no user lookup
+    user_id = payload.get("uid")
+    if user_id:
+        principal = {"user_id": user_id, "username": username, "email": payload.get("email", "")}
+    else:
+        principal = principal_cache.get(username)
+        if principal is None:
+            user = await db.users.find_one({"username": username}, {"username": 1, "email": 1})
+            if user is None:
+                raise credentials_exception
+            principal = cache_principal(user)
+
+    if payload.get("iat", 0) < await tokens_valid_after(principal["user_id"]):
         raise credentials_exception
-        
-    return str(user["_id"])
+    return principal
 
-async def get_current_active_user(user_id: str = Depends(get_current_user)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+async def get_current_user(principal: dict = Depends(get_current_principal)):
+    return principal["user_id"]
+
+async def get_current_active_user(principal: dict = Depends(get_current_principal)):
+    return UserProfileResponse(
+        username=principal["username"],
+        email=principal["email"]
     )
-    
-    try:
-        # Find the user by ID and convert ObjectId to string
-        user_data = await db.users.find_one({"_id": ObjectId(user_id)})
-        
-        if user_data is None:
-            raise credentials_exception
-        
-        # Convert user data to User model
-        user = User(
-            username=user_data.get('username'),
-            email=user_data.get('email'),
-            password=user_data.get('password')  # Be careful with password handling
-        )
-        
-        return user
-    except Exception as e:
-        raise credentials_exception
+
+async def require_admin(x_admin_password: str = Header(...)):
+    if not settings.ADMIN_CLEAR_PASSWORD or not secrets.compare_digest(
+        x_admin_password, settings.ADMIN_CLEAR_PASSWORD
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin password")
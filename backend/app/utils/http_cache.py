@@ -0,0 +1,29 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+def make_etag(user_id: str, version: int, *parts) -> str:
+    # Weak validator: the user's data version plus whatever distinguishes this representation
+    digest = hashlib.blake2s(repr((user_id,) + parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+def set_etag(response: Response, etag: str):
+    response.headers.update(etag_headers(etag))
@@ -1,50 +1,173 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from ..core.config import settings
+from ..core.middleware import request_id_var
+
+# The event loop only ever enqueues records; a QueueListener thread owns every
+# handler that formats or writes to disk.
+_listener = None
+_queue_handler = None
+
 
 class DetailedFormatter(logging.Formatter):
     def format(self, record):
         record.pathname = record.pathname.split('/')[-1]
         return super().format(record)
 
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+        }
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class DebugSampler(logging.Filter):
+    # Keeps only a fraction of DEBUG records; everything above DEBUG always passes
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class RequestIdFilter(logging.Filter):
+    # Runs on the queue handler, i.e. in the logging thread's caller, where the
+    # request context is still visible; the listener thread only sees the record
+    def filter(self, record):
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Never block the event loop: when the queue is full the record is dropped and counted
+    dropped = 0
+
+    def prepare(self, record):
+        # Only the message is resolved here, so later changes to its args don't leak
+        # in; the traceback stays in exc_info and is formatted by the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def _parse_levels(spec: str) -> dict:
+    # "pymongo=WARNING,app.api=DEBUG" -> {"pymongo": "WARNING", "app.api": "DEBUG"}
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _file_handler(path, level, formatter):
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT
+    )
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def stop_logging():
+    global _listener, _queue_handler
+    if _listener is not None:
+        # Flushes everything still queued before returning
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
 def setup_logging():
+    global _listener, _queue_handler
+
+    # Safe to call again: the previous pipeline is flushed and replaced, never duplicated
+    stop_logging()
+
     # Create logs directory if it doesn't exist
-    logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
+    logs_dir = settings.LOG_DIR or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs'
+    )
     os.makedirs(logs_dir, exist_ok=True)
 
     # Configure logging
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(settings.LOG_LEVEL)
+    for name, level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    json_formatter = JsonFormatter() if settings.LOG_JSON else None
 
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter('%(levelname)s: %(message)s')
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(json_formatter or logging.Formatter('%(levelname)s: %(message)s'))
 
     # File handler for detailed logs
-    detailed_handler = RotatingFileHandler(
+    detailed_handler = _file_handler(
         os.path.join(logs_dir, 'detailed.log'),
-        maxBytes=1024*1024,  # 1MB
-        backupCount=5
+        logging.DEBUG,
+        json_formatter or DetailedFormatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(pathname)s:%(lineno)d] - [%(request_id)s] - %(message)s'
+        )
     )
-    detailed_handler.setLevel(logging.DEBUG)
-    detailed_formatter = DetailedFormatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(pathname)s:%(lineno)d] - %(message)s'
-    )
-    detailed_handler.setFormatter(detailed_formatter)
-    logger.addHandler(detailed_handler)
 
     # File handler for registration logs
-    registration_handler = RotatingFileHandler(
+    registration_handler = _file_handler(
         os.path.join(logs_dir, 'registration.log'),
-        maxBytes=1024*1024,  # 1MB
-        backupCount=5
+        logging.INFO,
+        json_formatter or logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    )
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+    if settings.LOG_DEBUG_SAMPLE_RATE < 1:
+        _queue_handler.addFilter(DebugSampler(settings.LOG_DEBUG_SAMPLE_RATE))
+    logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(
+        _queue_handler.queue,
+        console_handler,
+        detailed_handler,
+        registration_handler,
+        respect_handler_level=True
     )
-    registration_handler.setLevel(logging.INFO)
-    registration_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    registration_handler.setFormatter(registration_formatter)
-    logger.addHandler(registration_handler)
+    _listener.start()
 
     return logger
+
+
+atexit.register(stop_logging)
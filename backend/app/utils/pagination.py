@@ -0,0 +1,34 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(date: datetime, object_id: ObjectId) -> str:
+    # Opaque to clients: url-safe base64 of the (date, _id) of the last row on a page
+    raw = json.dumps({"d": date.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["d"]), ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor("Invalid pagination cursor") from e
+
+
+def keyset_filter(date: datetime, object_id: ObjectId, descending: bool) -> dict:
+    # Rows strictly after (date, _id) in the requested sort order
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {"date": {op: date}},
+        {"date": date, "_id": {op: object_id}},
+    ]}
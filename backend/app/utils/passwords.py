@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from passlib.hash import bcrypt
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Module-level so they can be pickled into a process pool
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return bcrypt.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    # Runs bcrypt off the event loop. At most `max_concurrency` operations are handed
+    # to the pool at once; the rest wait on a semaphore and are counted as queued.
+    # With workers=0 hashing runs inline, which is only useful for comparison benchmarks.
+
+    def __init__(self, workers: int, max_concurrency: int, executor: str = "thread", rounds: int = 12):
+        self.workers = workers
+        self.max_concurrency = max(1, max_concurrency)
+        self.executor_kind = executor
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so process pools start after any server fork
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.workers <= 0:
+            self.completed += 1
+            return fn(*args)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    async def warm_up(self):
+        # Start every pool worker and load bcrypt there before the first login; a
+        # minimal cost factor keeps this cheap
+        if self.workers > 0:
+            await asyncio.gather(*(self._run(_hash, "warm-up", 4) for _ in range(self.workers)))
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind if self.workers > 0 else "inline",
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    rounds=settings.BCRYPT_ROUNDS
+)
@@ -0,0 +1,92 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+
+from ..core.config import settings
+from ..core.database import db
+from .auth import tokens_valid_after
+
+# Refresh tokens are signed JWTs whose jti is also the _id of a refresh_tokens
+# document. Each use marks the document as rotated and issues a new token in the
+# same family; presenting an already-rotated token revokes the whole family, as does
+# presenting one issued before the user's tokens were revoked (see auth).
+# Documents are removed by a TTL index on expires_at.
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+async def issue_refresh_token(user: dict, family: Optional[str] = None) -> str:
+    jti = uuid.uuid4().hex
+    family = family or uuid.uuid4().hex
+    expires_at = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    await db.refresh_tokens.insert_one({
+        "_id": jti,
+        "family": family,
+        "user_id": str(user["_id"]),
+        "username": user["username"],
+        "email": user.get("email", ""),
+        "revoked": False,
+        "issued_at": int(time.time()),
+        "created_at": datetime.utcnow(),
+        "expires_at": expires_at
+    })
+
+    return jwt.encode(
+        {"sub": user["username"], "jti": jti, "fam": family, "type": "refresh", "exp": expires_at},
+        settings.JWT_SECRET_KEY,
+        algorithm=settings.JWT_ALGORITHM
+    )
+
+
+def _decode(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        raise InvalidRefreshToken()
+    if payload.get("type") != "refresh" or not payload.get("jti"):
+        raise InvalidRefreshToken()
+    return payload
+
+
+async def rotate_refresh_token(token: str) -> tuple:
+    # Returns (user, new refresh token) after a signature check and one indexed update
+    payload = _decode(token)
+
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"_id": payload["jti"], "revoked": False},
+        {"$set": {"revoked": True, "rotated_at": datetime.utcnow()}}
+    )
+    if stored is None:
+        # Unknown, expired or already used: treat reuse as theft and end the family
+        await revoke_family(payload.get("fam"))
+        raise InvalidRefreshToken()
+    if stored.get("issued_at", 0) < await tokens_valid_after(stored["user_id"]):
+        # Revoked by /admin/clear-users before the clear job reached refresh_tokens
+        await revoke_family(stored["family"])
+        raise InvalidRefreshToken()
+
+    user = {"_id": stored["user_id"], "username": stored["username"], "email": stored["email"]}
+    return user, await issue_refresh_token(user, family=stored["family"])
+
+
+async def revoke_refresh_token(token: str):
+    payload = _decode(token)
+    await revoke_family(payload.get("fam"))
+
+
+async def revoke_family(family: Optional[str]):
+    if family:
+        await db.refresh_tokens.update_many(
+            {"family": family, "revoked": False},
+            {"$set": {"revoked": True}}
+        )
+
+
+async def delete_user_refresh_tokens(user_id: str):
+    await db.refresh_tokens.delete_many({"user_id": user_id})
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from ..core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Only the fields the Expense response model exposes
+EXPENSE_PROJECTION = {
+    "_id": 1, "amount": 1, "currency": 1, "description": 1, "category": 1, "date": 1, "user_id": 1
+}
+
+
+def expense_to_dict(doc: dict) -> dict:
+    # Trusted database output: map _id to id in one pass without model validation
+    return {
+        "id": str(doc["_id"]),
+        "user_id": doc["user_id"],
+        "amount": doc["amount"],
+        "currency": doc.get("currency", settings.DEFAULT_CURRENCY),
+        "description": doc.get("description", ""),
+        "category": doc.get("category", "other"),
+        "date": doc["date"],
+    }
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    # Encodes straight to bytes, with orjson when it is installed
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
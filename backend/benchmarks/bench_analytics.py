@@ -0,0 +1,126 @@
+"""Latency of /expense-insights/advanced analytics for a user with 100k expenses.
+
+Runs in-process on synthetic data. The expenses are grouped by (day, category) the
+way the MongoDB pipeline returns them, then the bench times loading those rows into
+columns and computing the analytics. A plain-Python version of the rolling windows
+and z-scores serves as a reference for both speed and correctness:
+
+    python benchmarks/bench_analytics.py --expenses 100000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analytics import ANOMALY_MIN_HISTORY, ANOMALY_WINDOW, DailyColumns, compute_analytics  # noqa: E402
+
+CATEGORIES = ["food", "transportation", "entertainment", "shopping", "utilities", "health", "education", "other"]
+
+
+def make_rows(expenses, days, today, seed):
+    # Synthetic expenses over the last `days` days, grouped by (day, category)
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(0, days, expenses)
+    categories = rng.integers(0, len(CATEGORIES), expenses)
+    amounts = np.round(rng.lognormal(3, 1, expenses), 2)
+    keys = offsets * len(CATEGORIES) + categories
+    totals = np.bincount(keys, weights=amounts, minlength=days * len(CATEGORIES))
+    counts = np.bincount(keys, minlength=days * len(CATEGORIES))
+    first_day = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+    return [
+        {
+            "day": first_day + timedelta(days=int(key // len(CATEGORIES))),
+            "category": CATEGORIES[key % len(CATEGORIES)],
+            "total": float(totals[key]),
+            "count": int(counts[key]),
+        }
+        for key in np.flatnonzero(counts)
+    ]
+
+
+def reference(rows, today, lookback_days):
+    # Day-by-day loops over a dict of daily totals: rolling averages and z-scores
+    start = today - timedelta(days=lookback_days - 1)
+    daily = {}
+    for row in rows:
+        day = row["day"].date()
+        if start <= day <= today:
+            daily[day] = daily.get(day, 0.0) + row["total"]
+    days = [start + timedelta(days=i) for i in range(lookback_days)]
+    first = min(daily) if daily else today
+    result = {}
+    for day in days:
+        history = max((day - first).days + 1, 1)
+        window = {}
+        for width in (7, 30):
+            total = sum(daily.get(day - timedelta(days=k), 0.0) for k in range(width))
+            window[width] = total / min(history, width)
+        prior = min(history - 1, ANOMALY_WINDOW)
+        previous = [daily.get(day - timedelta(days=k), 0.0) for k in range(1, prior + 1)]
+        z = 0.0
+        if prior >= ANOMALY_MIN_HISTORY:
+            mean = sum(previous) / prior
+            std = math.sqrt(max(sum(v * v for v in previous) / prior - mean * mean, 0.0))
+            if std > 1e-9:
+                z = (daily.get(day, 0.0) - mean) / std
+        result[day.isoformat()] = (window[7], window[30], z)
+    return result
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return value, {
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--expenses", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=400, help="Days the expenses are spread over")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    today = date.today()
+    lookback = args.days
+    rows = make_rows(args.expenses, args.days, today, args.seed)
+
+    columns, load = timed(lambda: DailyColumns.from_rows(rows), args.repeat)
+    result, compute = timed(
+        lambda: compute_analytics(columns, today, lookback_days=lookback, series_days=lookback), args.repeat
+    )
+    expected, naive = timed(lambda: reference(rows, today, lookback), max(1, args.repeat // 10))
+
+    # The vectorised series must match the loops to rounding
+    for day in result["daily"]:
+        r7, r30, z = expected[day["date"]]
+        assert abs(day["rolling_7"] - r7) < 0.01 and abs(day["rolling_30"] - r30) < 0.01, day
+        assert abs(day["z_score"] - z) < 0.01, day
+
+    print(json.dumps({
+        "expenses": args.expenses,
+        "grouped_rows": len(rows),
+        "load_columns": load,
+        "compute": compute,
+        "python_reference": naive,
+        "speedup": round(naive["p50_ms"] / max(load["p50_ms"] + compute["p50_ms"], 1e-6), 1),
+        "anomalies": len(result["anomalies"]),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
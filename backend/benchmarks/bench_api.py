@@ -0,0 +1,284 @@
+"""End-to-end API latency and throughput, in-process, against an in-memory Mongo.
+
+Drives the real FastAPI app through httpx's ASGI transport with the Motor client
+swapped for benchmarks/fake_mongo.py, so no server or mongod is needed. Seeds
+--users accounts with --history expenses each, then reports throughput and
+p50/p95/p99 for /token, expense CRUD, /expense-insights and /users/me deletion.
+
+Record a baseline, then compare another commit against it (exit code 1 when a
+scenario's p95 regresses by more than --max-regression):
+
+    python benchmarks/bench_api.py --output baseline.json
+    python benchmarks/bench_api.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CATEGORIES = ["food", "transportation", "entertainment", "shopping", "utilities", "health", "education", "other"]
+PASSWORD = "bench-password"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_app(args):
+    # Settings are read at import time, so configure the environment first
+    os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="chillbills-bench-logs-"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Every request comes from one client address, which per-IP rate limits would throttle
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    from benchmarks.fake_mongo import FakeClient
+    from app.core import database
+    from app.core.config import settings
+
+    # Every module binds `db` on import, so the swap must happen before main is imported
+    database.client = FakeClient()
+    database.db = database.read_db = database.client[settings.DB_NAME]
+
+    from main import app
+    return app
+
+
+def make_expense(rng, start, days):
+    return {
+        "amount": round(rng.uniform(1, 250), 2),
+        "description": f"bench expense {rng.randrange(10 ** 6)}",
+        "category": rng.choice(CATEGORIES),
+        "date": (start + timedelta(days=rng.randrange(days), minutes=rng.randrange(1440))).isoformat(),
+    }
+
+
+async def seed_user(client, name, history, rng):
+    response = await client.post("/users", json={
+        "username": name, "email": f"{name}@example.com", "password": PASSWORD
+    })
+    response.raise_for_status()
+    response = await client.post("/token", data={"username": name, "password": PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    start = datetime.utcnow() - timedelta(days=365)
+    ids = []
+    for offset in range(0, history, 1000):
+        rows = [make_expense(rng, start, 365) for _ in range(min(1000, history - offset))]
+        response = await client.post("/expenses/bulk", json=rows, headers=headers)
+        response.raise_for_status()
+    if history:
+        response = await client.get("/expenses", params={"limit": 200}, headers=headers)
+        response.raise_for_status()
+        ids = [row["id"] for row in response.json()]
+    return {"username": name, "headers": headers, "expense_ids": ids}
+
+
+async def run_scenario(name, make_request, iterations, concurrency):
+    # make_request(i) returns an awaitable response; non-2xx responses count as errors
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(iterations):
+        queue.put_nowait(i)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+            # A request served entirely from memory never suspends in-process; yield so
+            # the workers interleave as they would over real sockets
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return name, {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run(args):
+    import httpx
+
+    app = load_app(args)
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            users = [await seed_user(client, f"bench_user_{i}", args.history, rng) for i in range(args.users)]
+            # Deletion is destructive, so it gets its own accounts with the same history size
+            doomed = [
+                await seed_user(client, f"bench_doomed_{i}", args.history, rng)
+                for i in range(args.delete_users)
+            ]
+
+            def user_for(i):
+                return users[i % len(users)]
+
+            created = []
+
+            async def login(i):
+                return await client.post("/token", data={"username": user_for(i)["username"], "password": PASSWORD})
+
+            async def create(i):
+                user = user_for(i)
+                response = await client.post(
+                    "/expenses", json=make_expense(rng, datetime.utcnow() - timedelta(days=30), 30),
+                    headers=user["headers"]
+                )
+                if response.status_code == 200:
+                    created.append((user, response.json()))
+                return response
+
+            async def list_page(i):
+                return await client.get("/expenses", params={"limit": 50}, headers=user_for(i)["headers"])
+
+            async def read_one(i):
+                user = user_for(i)
+                expense_id = user["expense_ids"][i % len(user["expense_ids"])] if user["expense_ids"] else "0" * 24
+                return await client.get(f"/expenses/{expense_id}", headers=user["headers"])
+
+            async def update(i):
+                user, expense = created[i % len(created)]
+                body = dict(expense, amount=round(rng.uniform(1, 250), 2), description=f"updated {i}")
+                return await client.put(f"/expenses/{expense['id']}", json=body, headers=user["headers"])
+
+            async def delete(i):
+                user, expense = created[i]
+                return await client.delete(f"/expenses/{expense['id']}", headers=user["headers"])
+
+            async def insights(i):
+                return await client.get("/expense-insights", headers=user_for(i)["headers"])
+
+            async def delete_account(i):
+                return await client.delete("/users/me", headers=doomed[i]["headers"])
+
+            scenarios = [
+                ("token", login, args.login_iterations),
+                ("create_expense", create, args.iterations),
+                ("list_expenses", list_page, args.iterations),
+                ("get_expense", read_one, args.iterations),
+                ("update_expense", update, args.iterations),
+                ("delete_expense", delete, args.iterations),
+                ("expense_insights", insights, args.iterations),
+                ("delete_user", delete_account, args.delete_users),
+            ]
+            for name, make_request, iterations in scenarios:
+                if iterations <= 0:
+                    continue
+                if name == "delete_expense":
+                    iterations = min(iterations, len(created))
+                scenario, stats = await run_scenario(name, make_request, iterations, args.concurrency)
+                results[scenario] = stats
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, max_regression):
+    # Returns the scenarios whose p95 grew by more than max_regression (a fraction)
+    regressions = []
+    for name, stats in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        throughput = (
+            (stats["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"]
+            if before["throughput_rps"] else 0.0
+        )
+        flag = "REGRESSION" if change > max_regression else ""
+        print(
+            f"{name:18} p95 {before['p95_ms']:9.3f} -> {stats['p95_ms']:9.3f} ms ({change:+7.1%})  "
+            f"throughput {before['throughput_rps']:8.1f} -> {stats['throughput_rps']:8.1f} rps ({throughput:+7.1%})  "
+            f"{flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--history", type=int, default=1000, help="Expenses seeded per user")
+    parser.add_argument("--iterations", type=int, default=500, help="Requests per expense scenario")
+    parser.add_argument("--login-iterations", type=int, default=50, help="Requests for /token (bcrypt bound)")
+    parser.add_argument("--delete-users", type=int, default=10, help="Accounts seeded for /users/me deletion")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None, help="Override BCRYPT_ROUNDS for the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare against a baseline file written by --output")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth, as a fraction")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "recorded_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users, "history": args.history, "iterations": args.iterations,
+            "login_iterations": args.login_iterations, "delete_users": args.delete_users,
+            "concurrency": args.concurrency, "bcrypt_rounds": args.bcrypt_rounds,
+        },
+        "scenarios": asyncio.run(run(args)),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: baseline was recorded with a different configuration", file=sys.stderr)
+        regressions = compare(baseline, results, args.max_regression)
+        if regressions:
+            print(f"p95 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Currency conversion of a large report: the vectorised RateTable pass against per-row lookups.
+
+Builds a rate table with daily rates for a few currencies over two years, then
+converts synthetic expense rows into the base currency three ways: a cold table
+(empty memo), a warm table (every (currency, day) factor memoised) and a
+plain-Python bisect per row, which also checks the results:
+
+    python benchmarks/bench_fx.py --rows 100000
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.fx import EPOCH_ORDINAL, RateTable  # noqa: E402
+
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CHF", "CAD"]
+
+
+def make_rates(days, today, seed):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for currency, level in zip(CURRENCIES[1:], (0.9, 0.8, 150.0, 0.95, 1.35)):
+        walk = level * np.exp(np.cumsum(rng.normal(0, 0.004, days)))
+        # Weekends carry no rate, like central bank fixings
+        rows.extend(
+            (today - timedelta(days=days - 1 - i), currency, float(rate))
+            for i, rate in enumerate(walk)
+            if (today - timedelta(days=days - 1 - i)).weekday() < 5
+        )
+    return rows
+
+
+def reference(rows, amounts, currencies, days, target):
+    # One bisect per row over each currency's sorted days
+    series = {}
+    for day, currency, rate in sorted(rows):
+        known = series.setdefault(currency, ([], []))
+        known[0].append(day.toordinal() - EPOCH_ORDINAL)
+        known[1].append(rate)
+
+    def rate(currency, day):
+        if currency == "USD":
+            return 1.0
+        known_days, rates = series[currency]
+        return rates[max(bisect.bisect_right(known_days, day) - 1, 0)]
+
+    return [
+        amount * rate(target, day) / rate(currency, day)
+        for amount, currency, day in zip(amounts, currencies, days)
+    ]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return value, {
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=730, help="Days the rates and expenses cover")
+    parser.add_argument("--target", default="EUR", choices=CURRENCIES)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    today = date.today()
+    rates = make_rates(args.days, today, args.seed)
+    rng = np.random.default_rng(args.seed)
+    amounts = np.round(rng.lognormal(3, 1, args.rows), 2)
+    currencies = [CURRENCIES[i] for i in rng.integers(0, len(CURRENCIES), args.rows)]
+    days = (today.toordinal() - EPOCH_ORDINAL) - rng.integers(0, args.days, args.rows)
+
+    def cold():
+        table = RateTable.from_rows(rates, "USD", "bench")
+        return table.convert(amounts, currencies, days, args.target)
+
+    warm_table = RateTable.from_rows(rates, "USD", "bench")
+    warm_table.convert(amounts, currencies, days, args.target)
+
+    converted, cold_stats = timed(cold, args.repeat)
+    _, warm_stats = timed(lambda: warm_table.convert(amounts, currencies, days, args.target), args.repeat)
+    expected, naive = timed(
+        lambda: reference(rates, amounts.tolist(), currencies, days.tolist(), args.target), max(1, args.repeat // 5)
+    )
+    assert np.allclose(converted, expected), "vectorised conversion differs from the per-row reference"
+
+    print(json.dumps({
+        "rows": args.rows,
+        "rates": len(rates),
+        "cold_table": cold_stats,
+        "memoised": warm_stats,
+        "per_row_reference": naive,
+        "speedup": round(naive["p50_ms"] / max(warm_stats["p50_ms"], 1e-6), 1),
+        "memo": warm_table.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Latency of GET /expenses while /token logins hammer the same server.
+
+Start the server once with inline hashing and once with the worker pool, and
+run this script against each:
+
+    PASSWORD_HASH_WORKERS=0 uvicorn main:app --port 8000   # before
+    PASSWORD_HASH_WORKERS=4 uvicorn main:app --port 8000   # after
+
+    python benchmarks/bench_login_load.py --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def create_account(client):
+    username = f"bench_{uuid.uuid4().hex[:12]}"
+    password = "bench-password"
+    response = await client.post("/users", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": password,
+    })
+    response.raise_for_status()
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return username, password, response.json()["access_token"]
+
+
+async def login_loop(client, username, password, stop):
+    while not stop.is_set():
+        await client.post("/token", data={"username": username, "password": password})
+
+
+async def measure_reads(client, token, duration, interval):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/expenses", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.logins + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        username, password, token = await create_account(client)
+
+        stop = asyncio.Event()
+        logins = [
+            asyncio.create_task(login_loop(client, username, password, stop))
+            for _ in range(args.logins)
+        ]
+        try:
+            latencies = await measure_reads(client, token, args.duration, args.interval)
+        finally:
+            stop.set()
+            await asyncio.gather(*logins, return_exceptions=True)
+
+        await client.delete("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    return {
+        "concurrent_logins": args.logins,
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=16, help="concurrent /token loops")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to sample /expenses")
+    parser.add_argument("--interval", type=float, default=0.01, help="pause between /expenses calls")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-request cost of MetricsMiddleware and the Mongo command listener.
+
+Drives a trivial ASGI app directly, with and without instrumentation, and fails
+(exit code 1) if recording adds more than --max-overhead-us per request:
+
+    python benchmarks/bench_metrics_overhead.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.metrics import MetricsMiddleware, command_listener  # noqa: E402
+
+
+class _Route:
+    path = "/expenses/{expense_id}"
+
+
+async def plain_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def mongo_app(commands):
+    # Simulates an endpoint issuing `commands` Mongo commands through the listener
+    started = SimpleNamespace(
+        command={"find": "expenses"}, command_name="find", connection_id=("localhost", 27017), request_id=0
+    )
+    succeeded = SimpleNamespace(
+        command_name="find", connection_id=("localhost", 27017), request_id=0, duration_micros=350
+    )
+
+    async def app(scope, receive, send):
+        scope["route"] = _Route
+        for _ in range(commands):
+            command_listener.started(started)
+            command_listener.succeeded(succeeded)
+        await plain_app(scope, receive, send)
+
+    return app
+
+
+async def drive(app, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/expenses/1"}
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+async def run(args):
+    results = {}
+    for name, app in (
+        ("baseline", plain_app),
+        ("instrumented", MetricsMiddleware(mongo_app(args.commands))),
+    ):
+        best = min([await drive(app, args.requests) for _ in range(args.repeat)])
+        results[name] = round(best / args.requests * 1e6, 2)
+    results["overhead_us_per_request"] = round(results["instrumented"] - results["baseline"], 2)
+    results["mongo_commands_per_request"] = args.commands
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--commands", type=int, default=3, help="Mongo commands recorded per request")
+    parser.add_argument("--max-overhead-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if results["overhead_us_per_request"] > args.max_overhead_us:
+        print(f"Metrics overhead exceeds {args.max_overhead_us}us per request", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Rows/second for serialising GET /expenses responses, model path vs fast path.
+
+Runs entirely in-process on synthetic documents shaped like the expenses collection:
+
+    python benchmarks/bench_serialization.py --rows 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.models.expense import Expense  # noqa: E402
+from app.utils.serialization import FastJSONResponse, expense_to_dict, orjson  # noqa: E402
+
+
+def make_docs(rows):
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": "5f43a1b2c3d4e5f6a7b8c9d0",
+            "amount": round(5 + (i % 97) * 1.37, 2),
+            "description": f"expense {i}",
+            "category": ("food", "shopping", "utilities", "other")[i % 4],
+            "date": start + timedelta(hours=i),
+            "seq": i,
+            "updated_at": start,
+        }
+        for i in range(rows)
+    ]
+
+
+def model_path(docs):
+    # What get_expenses used to do: build an Expense per row, then let FastAPI
+    # validate the list against response_model and encode it
+    expenses = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["id"] = str(doc.pop("_id"))
+        expenses.append(Expense(**doc))
+    validated = TypeAdapter(list[Expense]).validate_python(
+        [expense.model_dump() for expense in expenses]
+    )
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_path(docs):
+    return FastJSONResponse([expense_to_dict(doc) for doc in docs]).body
+
+
+def measure(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.rows)
+    assert json.loads(model_path(docs[:50])) == json.loads(fast_path(docs[:50]))
+
+    results = {}
+    for name, fn in (("model_path", model_path), ("fast_path", fast_path)):
+        seconds = measure(fn, docs, args.repeat)
+        results[name] = {"seconds": round(seconds, 4), "rows_per_second": int(args.rows / seconds)}
+    results["speedup"] = round(results["model_path"]["seconds"] / results["fast_path"]["seconds"], 1)
+    results["encoder"] = "orjson" if orjson is not None else "json"
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
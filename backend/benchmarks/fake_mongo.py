@@ -0,0 +1,867 @@
+"""In-memory stand-in for the slice of the Motor API this app uses.
+
+Good enough to drive every endpoint in-process for benchmarks; not a database.
+Documents round-trip through BSON on the way in and out, so stored values look
+exactly like what pymongo returns (naive UTC datetimes, millisecond precision)
+and callers never share references with the store. Equality lookups on the
+leading field of any created index go through a hash index instead of a scan,
+which keeps per-request cost flat as the seeded history grows.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import bson
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+# BSON comparison order between types
+_TYPE_RANK = {type(None): 1, int: 2, float: 2, str: 3, dict: 4, list: 5, ObjectId: 7, bool: 8, datetime: 9}
+
+
+def _naive_utc(value):
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _rank(value):
+    return _TYPE_RANK.get(type(value), 6)
+
+
+def _sort_key(value):
+    value = _naive_utc(value)
+    if value is _MISSING or value is None:
+        return (1, 0)
+    if isinstance(value, dict):
+        return (4, tuple((k, _sort_key(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return (5, tuple(_sort_key(v) for v in value))
+    return (_rank(value), value)
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _copy(doc):
+    return bson.decode(bson.encode(doc))
+
+
+def _compare(value, operand, op):
+    value, operand = _naive_utc(value), _naive_utc(operand)
+    if value is _MISSING or _rank(value) != _rank(operand):
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    return value <= operand
+
+
+def _equal(value, operand):
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, bool) != isinstance(operand, bool):
+        return False
+    return _naive_utc(value) == _naive_utc(operand)
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, operand in condition.items():
+            if op == "$eq" and not _equal(value, operand):
+                return False
+            if op == "$ne" and _equal(value, operand):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte") and not _compare(value, operand, op):
+                return False
+            if op == "$in" and not any(_equal(value, item) for item in operand):
+                return False
+            if op == "$nin" and any(_equal(value, item) for item in operand):
+                return False
+            if op == "$exists" and (value is not _MISSING) != bool(operand):
+                return False
+            if op == "$regex":
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                if not isinstance(value, str) or not re.search(operand, value, flags):
+                    return False
+        return True
+    if isinstance(condition, re.Pattern):
+        return isinstance(value, str) and bool(condition.search(value))
+    return _equal(value, condition)
+
+
+def matches(doc, query) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, clause) for clause in condition):
+                return False
+        elif not _match_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {"_id": doc["_id"]} if projection.get("_id", 1) and "_id" in doc else {}
+        for field in include:
+            value = _get(doc, field)
+            if value is not _MISSING:
+                out[field] = value
+        return out
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_docs(docs, sort, scores=None):
+    for field, direction in reversed(sort):
+        if isinstance(direction, dict):
+            # {"$meta": "textScore"}: best match first
+            docs.sort(key=lambda doc: scores[_hashable(doc["_id"])], reverse=True)
+        else:
+            docs.sort(key=lambda doc: _sort_key(_get(doc, field)), reverse=direction < 0)
+    return docs
+
+
+def _words(value):
+    return re.findall(r"\w+", value.lower()) if isinstance(value, str) else []
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _apply_update(doc, update, inserting):
+    if not any(key.startswith("$") for key in update):
+        # Replacement document
+        replaced = {"_id": doc["_id"]}
+        replaced.update(update)
+        doc.clear()
+        doc.update(replaced)
+        return
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set_path(doc, path, value)
+            elif op == "$inc":
+                current = _get(doc, path)
+                _set_path(doc, path, value if current is _MISSING else current + value)
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$max":
+                current = _get(doc, path)
+                if current is _MISSING or _sort_key(value) > _sort_key(current):
+                    _set_path(doc, path, value)
+            elif op == "$min":
+                current = _get(doc, path)
+                if current is _MISSING or _sort_key(value) < _sort_key(current):
+                    _set_path(doc, path, value)
+            elif op == "$push":
+                current = _get(doc, path)
+                _set_path(doc, path, ([] if current is _MISSING else list(current)) + [value])
+            elif op != "$setOnInsert":
+                raise OperationFailure(f"Unsupported update operator {op}")
+
+
+def _upsert_seed(query):
+    # Equality fields of the filter become fields of the inserted document
+    doc = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            if "$eq" in condition:
+                _set_path(doc, key, condition["$eq"])
+            continue
+        _set_path(doc, key, condition)
+    return doc
+
+
+# Aggregation expressions
+
+def _date_trunc(spec, doc):
+    date = _naive_utc(_evaluate(spec["date"], doc))
+    if not isinstance(date, datetime):
+        return None
+    unit = spec["unit"]
+    if unit == "year":
+        return datetime(date.year, 1, 1)
+    if unit == "month":
+        return datetime(date.year, date.month, 1)
+    day = datetime(date.year, date.month, date.day)
+    if unit == "day":
+        return day
+    if unit == "week":
+        weekdays = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        start = weekdays.index(spec.get("startOfWeek", "sunday").lower())
+        return day - timedelta(days=(day.weekday() - start) % 7)
+    if unit == "hour":
+        return date.replace(minute=0, second=0, microsecond=0)
+    raise OperationFailure(f"Unsupported $dateTrunc unit {unit}")
+
+
+def _evaluate(expression, doc):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            (op, argument), = expression.items()
+            if op == "$dateTrunc":
+                return _date_trunc(argument, doc)
+            if op == "$literal":
+                return argument
+            if op == "$eq":
+                left, right = (_evaluate(item, doc) for item in argument)
+                return _equal(left, right)
+            if op == "$cond":
+                if isinstance(argument, dict):
+                    argument = [argument["if"], argument["then"], argument["else"]]
+                condition, then, otherwise = argument
+                return _evaluate(then if _evaluate(condition, doc) else otherwise, doc)
+            if op == "$ifNull":
+                values = [_evaluate(item, doc) for item in argument]
+                return next((value for value in values[:-1] if value is not None), values[-1])
+            if op in ("$add", "$subtract", "$multiply", "$divide"):
+                values = [_evaluate(item, doc) for item in argument]
+                result = values[0]
+                for value in values[1:]:
+                    if op == "$add":
+                        result += value
+                    elif op == "$subtract":
+                        result -= value
+                    elif op == "$multiply":
+                        result *= value
+                    else:
+                        result /= value
+                return result
+            if op.startswith("$"):
+                raise OperationFailure(f"Unsupported expression {op}")
+        return {key: _evaluate(value, doc) for key, value in expression.items()}
+    return expression
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return ("__dict__",) + tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return ("__list__",) + tuple(_hashable(v) for v in value)
+    return value
+
+
+def _group(docs, spec):
+    groups = {}
+    accumulators = {field: acc for field, acc in spec.items() if field != "_id"}
+    for doc in docs:
+        key = _evaluate(spec["_id"], doc)
+        state = groups.get(_hashable(key))
+        if state is None:
+            state = groups[_hashable(key)] = {"_id": key, "__n": {}}
+        for field, acc in accumulators.items():
+            (op, expression), = acc.items()
+            value = _evaluate(expression, doc)
+            if op == "$sum":
+                state[field] = state.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$avg":
+                if isinstance(value, (int, float)):
+                    state[field] = state.get(field, 0) + value
+                    state["__n"][field] = state["__n"].get(field, 0) + 1
+            elif op == "$min":
+                if value is not None and (field not in state or _sort_key(value) < _sort_key(state[field])):
+                    state[field] = value
+            elif op == "$max":
+                if value is not None and (field not in state or _sort_key(value) > _sort_key(state[field])):
+                    state[field] = value
+            elif op == "$first":
+                state.setdefault(field, value)
+            elif op == "$last":
+                state[field] = value
+            elif op == "$push":
+                state.setdefault(field, []).append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator {op}")
+    results = []
+    for state in groups.values():
+        counts = state.pop("__n")
+        for field, acc in accumulators.items():
+            op = next(iter(acc))
+            if op == "$avg":
+                state[field] = state[field] / counts[field] if counts.get(field) else None
+            else:
+                state.setdefault(field, None)
+        results.append(state)
+    return results
+
+
+def _project_stage(docs, spec):
+    results = []
+    for doc in docs:
+        exclusion = all(value in (0, False) for value in spec.values())
+        if exclusion:
+            results.append({k: v for k, v in doc.items() if k not in spec})
+            continue
+        out = {"_id": doc["_id"]} if spec.get("_id", 1) not in (0, False) and "_id" in doc else {}
+        for field, expression in spec.items():
+            if field == "_id" and expression in (0, False, 1, True):
+                continue
+            if expression in (1, True):
+                value = _get(doc, field)
+                if value is not _MISSING:
+                    _set_path(out, field, value)
+            elif expression not in (0, False):
+                _set_path(out, field, _evaluate(expression, doc))
+        results.append(out)
+    return results
+
+
+class _Index:
+    def __init__(self, name, keys, unique):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _ in keys]
+        self.unique = unique
+        self.entries = defaultdict(set)
+
+    def key_for(self, doc):
+        return tuple(_hashable(_naive_utc(_get(doc, field))) for field in self.fields)
+
+    def lead_key(self, doc):
+        return _hashable(_naive_utc(_get(doc, self.fields[0])))
+
+
+class FakeCursor:
+    def __init__(self, collection, query, projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        self._batch_size = size
+        return self
+
+    def _run(self):
+        scores = None
+        if "$text" in self._query:
+            query = {key: value for key, value in self._query.items() if key != "$text"}
+            docs, scores = self._collection._text_search(query, self._query["$text"]["$search"])
+        else:
+            docs = self._collection._scan(self._query)
+        if self._sort:
+            docs = _sort_docs(docs, self._sort, scores)
+        if self._skip:
+            docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [self._with_meta(_copy(_project(doc, self._projection)), doc, scores) for doc in docs]
+
+    def _with_meta(self, out, doc, scores):
+        for field, spec in (self._projection or {}).items():
+            if isinstance(spec, dict) and spec.get("$meta") == "textScore":
+                out[field] = scores[_hashable(doc["_id"])]
+        return out
+
+    async def to_list(self, length=None):
+        docs = self._run()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._results = iter(self._run())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def explain(self):
+        index = self._collection._index_for(self._query)
+        if index is None:
+            stage = {"stage": "COLLSCAN"}
+        else:
+            stage = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": index.name}}
+        return {"queryPlanner": {"winningPlan": stage}}
+
+
+class FakeCommandCursor:
+    def __init__(self, docs):
+        self._docs = docs
+        self._results = None
+
+    async def to_list(self, length=None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        self._results = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._positions = {}
+        self._counter = 0
+        self._indexes = {}
+
+    # Indexes
+
+    def _index_for(self, query):
+        for index in self._indexes.values():
+            lead = index.fields[0]
+            condition = query.get(lead, _MISSING)
+            if condition is _MISSING:
+                continue
+            if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+                continue
+            return index
+        return None
+
+    def _candidates(self, query):
+        condition = query.get("_id", _MISSING)
+        if condition is not _MISSING and not (
+            isinstance(condition, dict) and any(key.startswith("$") for key in condition)
+        ):
+            doc = self._docs.get(_hashable(condition))
+            return [doc] if doc is not None else []
+        index = self._index_for(query)
+        if index is not None:
+            ids = index.entries.get(_hashable(_naive_utc(query[index.fields[0]])), ())
+            return [self._docs[_id] for _id in ids if _id in self._docs]
+        return list(self._docs.values())
+
+    def _scan(self, query):
+        docs = [doc for doc in self._candidates(query) if matches(doc, query)]
+        # Hash index buckets are unordered; keep natural (insertion) order like a collection scan
+        if len(docs) > 1 and "_id" not in query:
+            positions = self._positions
+            docs.sort(key=lambda doc: positions[_hashable(doc["_id"])])
+        return docs
+
+    def _text_search(self, query, search):
+        # Word matches in the text-indexed fields; no stemming, phrases or negation
+        fields = [field for index in self._indexes.values() for field, kind in index.keys if kind == "text"]
+        if not fields:
+            raise OperationFailure("text index required for $text query", 27)
+        terms = set(_words(search))
+        docs, scores = [], {}
+        for doc in self._scan(query):
+            words = [word for field in fields for word in _words(_get(doc, field))]
+            hits = sum(1 for word in words if word in terms)
+            if hits:
+                docs.append(doc)
+                scores[_hashable(doc["_id"])] = hits / len(words) + 0.5 * hits
+        return docs, scores
+
+    def _index_add(self, doc):
+        key_id = _hashable(doc["_id"])
+        for index in self._indexes.values():
+            if index.unique:
+                key = index.key_for(doc)
+                for other in index.entries.get(("__unique__", key), ()):
+                    if other != key_id:
+                        raise DuplicateKeyError(
+                            f"E11000 duplicate key error collection: {self.name} index: {index.name}",
+                            11000,
+                            {
+                                "code": 11000,
+                                "keyPattern": dict(index.keys),
+                                "keyValue": {field: _get(doc, field) for field in index.fields},
+                            },
+                        )
+        for index in self._indexes.values():
+            index.entries[index.lead_key(doc)].add(key_id)
+            if index.unique:
+                index.entries[("__unique__", index.key_for(doc))].add(key_id)
+
+    def _index_remove(self, doc):
+        key_id = _hashable(doc["_id"])
+        for index in self._indexes.values():
+            index.entries[index.lead_key(doc)].discard(key_id)
+            if index.unique:
+                index.entries[("__unique__", index.key_for(doc))].discard(key_id)
+
+    async def create_index(self, keys, unique=False, name=None, **kwargs):
+        keys = _normalize_sort(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        if name in self._indexes:
+            return name
+        index = _Index(name, keys, unique)
+        self._indexes[name] = index
+        try:
+            for doc in self._docs.values():
+                self._index_add_one(index, doc)
+        except DuplicateKeyError:
+            del self._indexes[name]
+            raise
+        return name
+
+    def _index_add_one(self, index, doc):
+        key_id = _hashable(doc["_id"])
+        if index.unique and index.entries.get(("__unique__", index.key_for(doc))):
+            raise DuplicateKeyError(f"E11000 duplicate key error index: {index.name}", 11000)
+        index.entries[index.lead_key(doc)].add(key_id)
+        if index.unique:
+            index.entries[("__unique__", index.key_for(doc))].add(key_id)
+
+    async def drop_index(self, name, **kwargs):
+        if name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]")
+        del self._indexes[name]
+
+    async def index_information(self):
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for index in self._indexes.values():
+            info[index.name] = {"key": index.keys, "unique": index.unique}
+        return info
+
+    # Writes
+
+    def _insert(self, document):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        stored = _copy(document)
+        key = _hashable(stored["_id"])
+        if key in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_",
+                11000,
+                {"code": 11000, "keyPattern": {"_id": 1}, "keyValue": {"_id": stored["_id"]}},
+            )
+        self._index_add(stored)
+        self._docs[key] = stored
+        self._counter += 1
+        self._positions[key] = self._counter
+        return stored["_id"]
+
+    async def insert_one(self, document, **kwargs):
+        return SimpleNamespace(inserted_id=self._insert(document), acknowledged=True)
+
+    async def insert_many(self, documents, ordered=True, **kwargs):
+        inserted, errors = [], []
+        for position, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": position, "code": 11000, "errmsg": str(e), **(e.details or {})})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+            })
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    def _replace_stored(self, old, new):
+        self._index_remove(old)
+        try:
+            self._index_add(new)
+        except DuplicateKeyError:
+            self._index_add(old)
+            raise
+        self._docs[_hashable(new["_id"])] = new
+
+    def _update(self, query, update, upsert, many, sort=None):
+        docs = self._scan(query)
+        if sort:
+            docs = _sort_docs(docs, _normalize_sort(sort))
+        if not many:
+            docs = docs[:1]
+        if not docs:
+            if not upsert:
+                return 0, 0, None, None, None
+            doc = _upsert_seed(query)
+            doc.setdefault("_id", ObjectId())
+            _apply_update(doc, update, inserting=True)
+            self._insert(doc)
+            return 0, 0, doc["_id"], None, self._docs[_hashable(doc["_id"])]
+        modified, before, after = 0, None, None
+        for stored in docs:
+            updated = _copy(stored)
+            _apply_update(updated, update, inserting=False)
+            updated = _copy(updated)
+            if updated != stored:
+                self._replace_stored(stored, updated)
+                modified += 1
+            before = before or stored
+            after = updated
+        return len(docs), modified, None, before, after
+
+    async def update_one(self, filter, update, upsert=False, **kwargs):
+        matched, modified, upserted_id, _, _ = self._update(filter, update, upsert, many=False)
+        return SimpleNamespace(
+            matched_count=matched, modified_count=modified, upserted_id=upserted_id, acknowledged=True
+        )
+
+    async def update_many(self, filter, update, upsert=False, **kwargs):
+        matched, modified, upserted_id, _, _ = self._update(filter, update, upsert, many=True)
+        return SimpleNamespace(
+            matched_count=matched, modified_count=modified, upserted_id=upserted_id, acknowledged=True
+        )
+
+    async def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return await self.update_one(filter, replacement, upsert=upsert)
+
+    async def find_one_and_update(
+        self, filter, update, projection=None, sort=None, upsert=False,
+        return_document=ReturnDocument.BEFORE, **kwargs
+    ):
+        _, _, upserted_id, before, after = self._update(filter, update, upsert, many=False, sort=sort)
+        if upserted_id is not None:
+            before = None
+        result = after if return_document == ReturnDocument.AFTER else before
+        return None if result is None else _copy(_project(result, projection))
+
+    def _delete(self, query, many, sort=None):
+        docs = self._scan(query)
+        if sort:
+            docs = _sort_docs(docs, _normalize_sort(sort))
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            self._index_remove(doc)
+            del self._docs[_hashable(doc["_id"])]
+            del self._positions[_hashable(doc["_id"])]
+        return docs
+
+    async def delete_one(self, filter, **kwargs):
+        return SimpleNamespace(deleted_count=len(self._delete(filter, many=False)), acknowledged=True)
+
+    async def delete_many(self, filter, **kwargs):
+        return SimpleNamespace(deleted_count=len(self._delete(filter, many=True)), acknowledged=True)
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        docs = self._delete(filter, many=False, sort=sort)
+        return _copy(_project(docs[0], projection)) if docs else None
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0, "upserted": 0}
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                self._insert(request._doc)
+                counts["inserted"] += 1
+            elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                matched, modified, upserted_id, _, _ = self._update(
+                    request._filter, request._doc, request._upsert, many=kind == "UpdateMany"
+                )
+                counts["matched"] += matched
+                counts["modified"] += modified
+                counts["upserted"] += upserted_id is not None
+            elif kind in ("DeleteOne", "DeleteMany"):
+                counts["deleted"] += len(self._delete(request._filter, many=kind == "DeleteMany"))
+            else:
+                raise OperationFailure(f"Unsupported bulk operation {kind}")
+        return SimpleNamespace(
+            inserted_count=counts["inserted"], matched_count=counts["matched"],
+            modified_count=counts["modified"], deleted_count=counts["deleted"],
+            upserted_count=counts["upserted"], acknowledged=True,
+        )
+
+    # Reads
+
+    def find(self, filter=None, projection=None, **kwargs):
+        cursor = FakeCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = self._scan(filter or {})
+        if sort:
+            docs = _sort_docs(docs, _normalize_sort(sort))
+        return _copy(_project(docs[0], projection)) if docs else None
+
+    async def count_documents(self, filter, **kwargs):
+        return len(self._scan(filter))
+
+    async def estimated_document_count(self, **kwargs):
+        return len(self._docs)
+
+    async def distinct(self, key, filter=None, **kwargs):
+        seen, values = set(), []
+        for doc in self._scan(filter or {}):
+            value = _get(doc, key)
+            if value is not _MISSING and _hashable(value) not in seen:
+                seen.add(_hashable(value))
+                values.append(value)
+        return values
+
+    def aggregate(self, pipeline, **kwargs):
+        docs = None
+        for stage in pipeline:
+            (op, spec), = stage.items()
+            if op == "$match":
+                docs = self._scan(spec) if docs is None else [doc for doc in docs if matches(doc, spec)]
+                continue
+            if docs is None:
+                docs = list(self._docs.values())
+            if op == "$group":
+                docs = _group(docs, spec)
+            elif op == "$sort":
+                docs = _sort_docs(list(docs), _normalize_sort(spec))
+            elif op == "$project":
+                docs = _project_stage(docs, spec)
+            elif op == "$limit":
+                docs = docs[:spec]
+            elif op == "$skip":
+                docs = docs[spec:]
+            elif op == "$count":
+                docs = [{spec: len(docs)}] if docs else []
+            else:
+                raise OperationFailure(f"Unsupported pipeline stage {op}")
+        if docs is None:
+            docs = list(self._docs.values())
+        return FakeCommandCursor([_copy(doc) for doc in docs])
+
+    async def drop(self):
+        self._docs.clear()
+        self._positions.clear()
+        for index in self._indexes.values():
+            index.entries.clear()
+
+
+class FakeDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = FakeCollection(self, name)
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def watch(self, pipeline=None, **kwargs):
+        # Like a standalone mongod
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+    async def command(self, command, *args, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ("ping", "hello", "ismaster", "isMaster"):
+            return {"ok": 1.0}
+        raise OperationFailure(f"Unsupported command {name}")
+
+    def with_options(self, **kwargs):
+        # Read preferences and concerns mean nothing with a single in-memory copy
+        return self
+
+    async def list_collection_names(self, **kwargs):
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+
+class FakeSession:
+    cluster_time = None
+    operation_time = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def end_session(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+
+    def __getitem__(self, name):
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = FakeDatabase(self, name)
+        return database
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    async def start_session(self, **kwargs):
+        return FakeSession()
+
+    def close(self):
+        pass
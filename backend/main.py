@@ -1,9 +1,20 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import logging
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.endpoints import router
-from app.core.database import test_db_connection
-from app.utils.logging import setup_logging
+from app.core.config import settings
+from app.core.database import client
+from app.core.health import readiness, warm_up
+from app.core.metrics import MetricsMiddleware, pool_listener, registry
+from app.core.middleware import CompressionMiddleware, RequestIdMiddleware
+from app.services import data_versions
+from app.services.events import change_stream_watcher, event_hub
+from app.services.fx import fx_rates
+from app.services.insights_cache import insights_cache
+from app.services.jobs import job_runner
+from app.utils.auth import auth_cache_stats
+from app.utils.logging import DroppingQueueHandler, setup_logging, stop_logging
+from app.utils.passwords import password_hasher
 
 # Setup logging
 logger = setup_logging()
@@ -24,24 +35,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large responses such as expense lists and exports
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Request metrics, exposed on /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Added last so it is outermost: every response and log record carries the id
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(router)
 
+def _numeric(stats: dict) -> dict:
+    return {key: value for key, value in stats.items() if isinstance(value, (int, float))}
+
+registry.register_collector("chillbills_auth_cache", "Principal cache statistics", lambda: auth_cache_stats())
+registry.register_collector(
+    "chillbills_password_hashing", "Password hashing pool statistics", lambda: _numeric(password_hasher.stats())
+)
+registry.register_collector(
+    "chillbills_data_version_cache", "Data version cache statistics", lambda: data_versions.cache_stats()
+)
+registry.register_collector(
+    "chillbills_insights_cache", "Insights result cache statistics", lambda: insights_cache.stats()
+)
+registry.register_collector(
+    "chillbills_fx_rates", "Exchange rate table statistics", lambda: _numeric(fx_rates.stats())
+)
+registry.register_collector(
+    "chillbills_event_streams", "Expense event stream statistics", lambda: _numeric(event_hub.stats())
+)
+registry.register_collector(
+    "chillbills_mongo_pool", "MongoDB connection pool usage across servers", lambda: _numeric(pool_listener.stats())
+)
+registry.register_collector(
+    "chillbills_log_records_dropped", "Log records dropped because the queue was full",
+    lambda: {"": DroppingQueueHandler.dropped}, kind="counter"
+)
+
+# Metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Liveness: the process is up and serving
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+# Readiness: warmed up and not shutting down; load balancers route on this
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status == "ready" else 503, content={"status": status})
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up the application")
-    if await test_db_connection():
-        logger.info("Successfully connected to the database")
-    else:
-        logger.error("Failed to connect to the database")
-        raise Exception("Database connection failed")
-
-# Error handling middleware
-@app.middleware("http")
-async def error_handling_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except Exception as e:
-        logger.error(f"Unhandled error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal Server Error")
+    await warm_up(app)
+    job_runner.start()
+    fx_rates.start()
+    await change_stream_watcher.start()
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Shutting down the application")
+    readiness.mark_draining()
+    event_hub.close()
+    await job_runner.stop()
+    await fx_rates.stop()
+    await change_stream_watcher.stop()
+    password_hasher.shutdown()
+    client.close()
+    stop_logging()
+
+# Unhandled errors become a JSON 500 carrying the request id
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.error(f"Unhandled error: {str(exc)}", exc_info=exc)
+    request_id = getattr(request.state, "request_id", None)
+    headers = {settings.REQUEST_ID_HEADER: request_id} if request_id else None
+    return JSONResponse(status_code=500, content={"detail": "Internal Server Error"}, headers=headers)
@@ -0,0 +1,37 @@
+import asyncio
+
+from app.core.metrics import MetricsMiddleware, http_requests_total, mongodb_command_duration_seconds
+from benchmarks.bench_metrics_overhead import drive, mongo_app, plain_app
+
+# Same budget as benchmarks/bench_metrics_overhead.py
+MAX_OVERHEAD_US = 50.0
+COMMANDS_PER_REQUEST = 3
+REQUESTS = 5000
+REPEAT = 5
+
+
+def _us_per_request(app) -> float:
+    # Best of several runs, so a scheduling hiccup doesn't fail the test
+    best = min(asyncio.run(drive(app, REQUESTS)) for _ in range(REPEAT))
+    return best / REQUESTS * 1e6
+
+
+def test_instrumentation_records_requests_and_commands():
+    requests_before = http_requests_total._values.get(("GET", "/expenses/{expense_id}", "200"), 0)
+    commands_before = mongodb_command_duration_seconds._values.get(
+        ("find", "expenses", "/expenses/{expense_id}"), [None, 0.0, 0]
+    )[2]
+
+    asyncio.run(drive(MetricsMiddleware(mongo_app(COMMANDS_PER_REQUEST)), 10))
+
+    assert http_requests_total._values[("GET", "/expenses/{expense_id}", "200")] == requests_before + 10
+    series = mongodb_command_duration_seconds._values[("find", "expenses", "/expenses/{expense_id}")]
+    assert series[2] == commands_before + 10 * COMMANDS_PER_REQUEST
+
+
+def test_instrumentation_overhead_per_request():
+    baseline = _us_per_request(plain_app)
+    instrumented = _us_per_request(MetricsMiddleware(mongo_app(COMMANDS_PER_REQUEST)))
+    assert instrumented - baseline <= MAX_OVERHEAD_US, (
+        f"Metrics add {instrumented - baseline:.1f}us per request (budget {MAX_OVERHEAD_US}us)"
+    )
@@ -1,5 +1,4 @@
 import 'package:flutter/foundation.dart';
-import 'package:http/http.dart' as http;
 import '../models/user.dart';
 import '../services/api_service.dart';
 import 'dart:convert';
@@ -137,24 +136,12 @@ class AuthProvider with ChangeNotifier {
     notifyListeners();
   }
 
-  Future<String?> _refreshToken(String expiredToken) async {
-    try {
-      final response = await http.post(
-        Uri.parse('https://your-backend-url.com/refresh-token'),
-        headers: {
-          'Content-Type': 'application/json',
-          'Authorization': 'Bearer $expiredToken',
-        },
-      );
-
-      if (response.statusCode == 200) {
-        final Map<String, dynamic> responseData = json.decode(response.body);
-        return responseData['access_token'];
-      }
-    } catch (e) {
-      print('Token refresh error: $e');
+  Future<String?> _refreshToken() async {
+    // Uses the refresh token saved at login, not the expired access token
+    final accessToken = await _apiService.refreshAccessToken();
+    if (accessToken != null) {
+      _token = accessToken;
     }
-    
-    return null;
+    return accessToken;
   }
 }
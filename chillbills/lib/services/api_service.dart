@@ -228,6 +228,7 @@ class ApiService {
         final responseBody = jsonDecode(response.body);
         final prefs = await SharedPreferences.getInstance();
         await prefs.setString('access_token', responseBody['access_token']);
+        await _saveRefreshToken(prefs, responseBody['refresh_token']);
         await prefs.setString('user_id', responseBody['user_id']?.toString() ?? '');
         await prefs.setString('username', responseBody['username']);
         return responseBody;
@@ -257,7 +258,61 @@ class ApiService {
 
   Future<void> deleteToken() async {
     final prefs = await SharedPreferences.getInstance();
+    final refreshToken = prefs.getString('refresh_token');
+    if (refreshToken != null) {
+      // End the refresh token family on the server; logout proceeds either way
+      try {
+        await client.post(
+          Uri.parse('$baseUrl/refresh-token/revoke'),
+          headers: {'Content-Type': 'application/json'},
+          body: jsonEncode({'refresh_token': refreshToken}),
+        );
+      } catch (e) {
+        debugPrint('Refresh token revoke error: $e');
+      }
+    }
     await prefs.remove('access_token');
+    await prefs.remove('refresh_token');
+  }
+
+  Future<void> _saveRefreshToken(SharedPreferences prefs, String? refreshToken) async {
+    if (refreshToken != null) {
+      await prefs.setString('refresh_token', refreshToken);
+    }
+  }
+
+  // Exchanges the stored refresh token for a new access/refresh pair.
+  // The server only accepts the refresh token from /token here, never an
+  // access token, and each refresh token can be used once.
+  Future<String?> refreshAccessToken() async {
+    final prefs = await SharedPreferences.getInstance();
+    final refreshToken = prefs.getString('refresh_token');
+    if (refreshToken == null) {
+      return null;
+    }
+
+    try {
+      final response = await client.post(
+        Uri.parse('$baseUrl/refresh-token'),
+        headers: {'Content-Type': 'application/json'},
+        body: jsonEncode({'refresh_token': refreshToken}),
+      );
+
+      if (response.statusCode == 200) {
+        final responseBody = jsonDecode(response.body);
+        await prefs.setString('access_token', responseBody['access_token']);
+        await _saveRefreshToken(prefs, responseBody['refresh_token']);
+        return responseBody['access_token'];
+      }
+      if (response.statusCode == 401) {
+        // Expired, revoked or already used: the user has to sign in again
+        await prefs.remove('refresh_token');
+      }
+    } catch (e) {
+      debugPrint('Token refresh error: $e');
+    }
+
+    return null;
   }
 
   Future<Map<String, dynamic>> register({
@@ -292,6 +347,7 @@ class ApiService {
         // Successful registration
         final prefs = await SharedPreferences.getInstance();
         await prefs.setString('access_token', responseBody['access_token']);
+        await _saveRefreshToken(prefs, responseBody['refresh_token']);
         await prefs.setString('user_id', responseBody['user_id']?.toString() ?? '');
         await prefs.setString('username', responseBody['username']);
         